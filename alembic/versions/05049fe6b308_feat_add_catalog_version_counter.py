@@ -0,0 +1,35 @@
+"""feat: add catalog version counter
+
+Revision ID: 05049fe6b308
+Revises: a84f5338b019
+Create Date: 2026-10-16 15:42:55.730418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '05049fe6b308'
+down_revision: Union[str, None] = 'a84f5338b019'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('catalog_version',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(
+        "INSERT INTO catalog_version (id, version, updated_at) "
+        "VALUES (1, 1, timezone('utc', now()))"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('catalog_version')
@@ -0,0 +1,41 @@
+"""fix: store date_of_birth as a string
+
+Revision ID: 4b1e6f0c9d27
+Revises: 7d2e9b4c1a60
+Create Date: 2026-10-16 23:05:41.286519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b1e6f0c9d27'
+down_revision: Union[str, None] = '7d2e9b4c1a60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Customer.date_of_birth holds a 'Month Day' string (see ShowCustomer), which
+# a date column cannot store; asyncpg also refuses to bind it there
+def upgrade() -> None:
+    op.alter_column(
+        'customers', 'date_of_birth',
+        existing_type=sa.Date(),
+        type_=sa.String(),
+        existing_nullable=True,
+        postgresql_using="to_char(date_of_birth, 'FMMonth FMDD')",
+    )
+
+
+def downgrade() -> None:
+    # the year is not stored, to_date fills in year 1
+    op.alter_column(
+        'customers', 'date_of_birth',
+        existing_type=sa.String(),
+        type_=sa.Date(),
+        existing_nullable=True,
+        postgresql_using="to_date(date_of_birth, 'FMMonth FMDD')",
+    )
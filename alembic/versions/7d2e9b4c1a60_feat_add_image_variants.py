@@ -0,0 +1,31 @@
+"""feat: add image variants
+
+Revision ID: 7d2e9b4c1a60
+Revises: 23c52f31e132
+Create Date: 2026-10-16 19:42:05.118304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2e9b4c1a60'
+down_revision: Union[str, None] = '23c52f31e132'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('image_variants', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.add_column('fabrics', sa.Column('image_variants', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.add_column('measurements', sa.Column('image_variants', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('measurements', 'image_variants')
+    op.drop_column('fabrics', 'image_variants')
+    op.drop_column('products', 'image_variants')
@@ -0,0 +1,43 @@
+"""perf: keyset pagination indexes on (created_at, id)
+
+Revision ID: a84f5338b019
+Revises: f20b69dda1c9
+Create Date: 2026-10-16 13:27:09.114362
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a84f5338b019'
+down_revision: Union[str, None] = 'f20b69dda1c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# customers are paginated on users.created_at through the joined inheritance
+INDEXES = [
+    ('ix_products_created_at_id', 'products'),
+    ('ix_fabrics_created_at_id', 'fabrics'),
+    ('ix_users_created_at_id', 'users'),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table in INDEXES:
+            op.create_index(
+                name, table, ['created_at', 'id'],
+                postgresql_concurrently=True, if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                postgresql_concurrently=True, if_exists=True,
+            )
@@ -0,0 +1,90 @@
+"""fix: bring catalog tables created by create_all under alembic
+
+Revision ID: ad44ef3c7cf2
+Revises: 90c22179cd52
+Create Date: 2026-10-16 09:12:41.205113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'ad44ef3c7cf2'
+down_revision: Union[str, None] = '90c22179cd52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# these tables and columns were created by Base.metadata.create_all on
+# existing deployments, so only create what is actually missing
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+
+    def missing(table, column):
+        return column not in {c['name'] for c in inspector.get_columns(table)}
+
+    if 'product_categories' not in tables:
+        op.create_table('product_categories',
+        sa.Column('id', sa.String(length=200), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id'),
+        sa.UniqueConstraint('name')
+        )
+    if 'fabrics' not in tables:
+        op.create_table('fabrics',
+        sa.Column('id', sa.String(length=200), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('category', sa.String(), nullable=True),
+        sa.Column('images', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id')
+        )
+    if 'fabric_prices' not in tables:
+        op.create_table('fabric_prices',
+        sa.Column('id', sa.String(length=200), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('fabric_id', sa.String(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=False),
+        sa.Column('product_category_id', sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(['fabric_id'], ['fabrics.id'], ),
+        sa.ForeignKeyConstraint(['product_category_id'], ['product_categories.id'], ),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('id')
+        )
+
+    if missing('products', 'category_id'):
+        op.add_column('products', sa.Column('category_id', sa.String(), nullable=True))
+        op.create_foreign_key(None, 'products', 'product_categories', ['category_id'], ['id'])
+
+    for column in (
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('paid_at', sa.String(), nullable=True),
+        sa.Column('amount_paid', sa.Integer(), nullable=True),
+    ):
+        if missing('cart', column.name):
+            op.add_column('cart', column)
+
+    for column in (
+        sa.Column('arm_hole', sa.Float(), nullable=True),
+        sa.Column('round_chest', sa.Float(), nullable=True),
+        sa.Column('images', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    ):
+        if missing('measurements', column.name):
+            op.add_column('measurements', column)
+
+
+def downgrade() -> None:
+    # the columns may predate this revision, so downgrading leaves them in place
+    pass
@@ -0,0 +1,55 @@
+"""perf: index foreign keys and lower(email) lookups
+
+Revision ID: f20b69dda1c9
+Revises: ad44ef3c7cf2
+Create Date: 2026-10-16 11:03:27.581920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f20b69dda1c9'
+down_revision: Union[str, None] = 'ad44ef3c7cf2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_cart_product_id', 'cart', ['product_id']),
+    ('ix_fabric_prices_fabric_id', 'fabric_prices', ['fabric_id']),
+    ('ix_fabric_prices_product_category_id', 'fabric_prices', ['product_category_id']),
+    ('ix_products_category_id', 'products', ['category_id']),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block, and
+    # does not lock the tables against writes while it builds
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns,
+                postgresql_concurrently=True, if_not_exists=True,
+            )
+        # fails if two accounts differ only by case, merge those first
+        op.create_index(
+            'ix_users_email_lower', 'users', [sa.text('lower(email)')],
+            unique=True, postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_users_email_lower', table_name='users',
+            postgresql_concurrently=True, if_exists=True,
+        )
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                postgresql_concurrently=True, if_exists=True,
+            )
@@ -3,6 +3,7 @@
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import EmailStr
+from typing import List
 
 
 from dotenv import load_dotenv
@@ -22,6 +23,61 @@ class Settings(BaseSettings):
     DB_HOST: str
     DB_PORT: str
 
+    # connection pool, shared by every request in a worker process.
+    # set DB_USE_NULLPOOL when connecting through PgBouncer in transaction mode
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_TIMEOUT: int = 30
+    DB_USE_NULLPOOL: bool = False
+    # refuse to start unless the database is at the Alembic head revision
+    DB_CHECK_MIGRATIONS: bool = True
+    # optional read replica (full SQLAlchemy URL) for read-only routes.
+    # reads go back to the primary while the replica lags more than the threshold
+    DB_REPLICA_URL: str | None = None
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DB_REPLICA_LAG_CHECK_SECONDS: float = 10.0
+    # per-request SQL counters in response headers and logs. statements repeated
+    # N_PLUS_ONE_THRESHOLD times in a request are flagged; strict loading makes
+    # relationships that were not eager loaded raise instead of querying
+    SQL_INSTRUMENTATION: bool = True
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5
+    SQL_STRICT_LOADING: bool = False
+    # keyset pagination of the list endpoints
+    PAGE_SIZE_DEFAULT: int = 50
+    PAGE_SIZE_MAX: int = 200
+    # in-process cache of catalog reads, bounded by entries and approximate bytes
+    CATALOG_CACHE_TTL_SECONDS: int = 60
+    CATALOG_CACHE_MAX_ENTRIES: int = 1024
+    CATALOG_CACHE_MAX_BYTES: int = 32 * 1024 * 1024
+    # how often each worker re-reads the catalog version (ETag / cache key)
+    CATALOG_VERSION_CHECK_SECONDS: float = 2.0
+    # verified principals cached per access token, never past the token's exp
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    # bcrypt runs on its own process pool; excess load is answered with 503
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = 5.0
+    # bcrypt cost is calibrated at startup to the target latency, within the
+    # bounds; set PASSWORD_HASH_ROUNDS to pin it instead
+    PASSWORD_HASH_TARGET_MS: float = 250.0
+    PASSWORD_HASH_MIN_ROUNDS: int = 10
+    PASSWORD_HASH_MAX_ROUNDS: int = 15
+    PASSWORD_HASH_ROUNDS: int | None = None
+    # sliding-window sign-in limits, checked before any bcrypt work. set the
+    # redis url to share the windows between workers and hosts
+    LOGIN_THROTTLE_ENABLED: bool = True
+    LOGIN_THROTTLE_IP_LIMIT: int = 30
+    LOGIN_THROTTLE_IP_WINDOW_SECONDS: int = 300
+    LOGIN_THROTTLE_EMAIL_LIMIT: int = 10
+    LOGIN_THROTTLE_EMAIL_WINDOW_SECONDS: int = 900
+    LOGIN_THROTTLE_MAX_KEYS: int = 100000
+    LOGIN_THROTTLE_REDIS_URL: str | None = None
+    # behind a reverse proxy, the header it puts the client address in, e.g.
+    # X-Real-IP; only set it if the proxy overwrites or appends to the header
+    LOGIN_THROTTLE_CLIENT_IP_HEADER: str | None = None
+
     # JWT
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str
@@ -34,12 +90,51 @@ class Settings(BaseSettings):
     EMAIL_USERNAME: str
     EMAIL_PASSWORD: str
     EMAIL_FROM: EmailStr
+    # turn both off to deliver to a local sink, e.g. `python -m aiosmtpd -n`
+    EMAIL_STARTTLS: bool = True
+    EMAIL_USE_CREDENTIALS: bool = True
+    # pooled SMTP sessions, reused across messages
+    EMAIL_POOL_SIZE: int = 4
+    EMAIL_MAX_MESSAGES_PER_CONNECTION: int = 100
+    EMAIL_IDLE_TIMEOUT_SECONDS: float = 60.0
+    EMAIL_TIMEOUT_SECONDS: float = 30.0
+    # jinja bytecode cache for the email templates; the system temp dir if unset
+    EMAIL_TEMPLATE_CACHE_DIR: str | None = None
+    # outbox delivery, see app.utils.outbox
+    OUTBOX_WORKER_ENABLED: bool = True
+    OUTBOX_BATCH_SIZE: int = 20
+    OUTBOX_POLL_SECONDS: float = 5.0
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BACKOFF_BASE_SECONDS: float = 30.0
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 3600.0
+    OUTBOX_LEASE_SECONDS: float = 300.0
 
     # aws
     S3_BUCKET_NAME: str
     S3_REGION: str
     S3_ACCESS_KEY: str
     S3_SECRET_KEY: str
+    # e.g. a local moto server; AWS when unset
+    S3_ENDPOINT_URL: str | None = None
+    # concurrent uploads per worker process, shared by all requests
+    S3_UPLOAD_WORKERS: int = 8
+    # streamed uploads: part size (5 MiB at least) and parts in flight per request
+    S3_MULTIPART_PART_SIZE: int = 8 * 1024 * 1024
+    S3_MULTIPART_CONCURRENCY: int = 4
+    # presigned direct-to-S3 uploads, see app.utils.upload_sessions
+    UPLOAD_ALLOWED_CONTENT_TYPES: List[str] = ["image/jpeg", "image/png", "image/webp"]
+    UPLOAD_MAX_BYTES: int = 10 * 1024 * 1024
+    UPLOAD_MAX_FILES: int = 10
+    UPLOAD_URL_EXPIRES_SECONDS: int = 600
+    UPLOAD_SESSION_MAX_AGE_SECONDS: int = 3600
+    # resized WebP/JPEG copies of uploaded images, made in the background
+    # after each upload, see app.utils.image_variants
+    IMAGE_VARIANTS_ENABLED: bool = True
+    IMAGE_VARIANT_WIDTHS: List[int] = [320, 640, 1024, 1600]
+    IMAGE_VARIANT_FORMATS: List[str] = ["webp", "jpeg"]
+    IMAGE_VARIANT_QUALITY: int = 80
+    IMAGE_VARIANT_WORKERS: int = 1
+    IMAGE_VARIANT_MAX_PENDING: int = 100
 
     # paystack
     PAYSTACK_SECRET_KEY: str
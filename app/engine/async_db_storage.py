@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""asyncio counterpart of DBStorage, backed by asyncpg"""
+
+import os
+
+from sqlalchemy import event, exc, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.config.config import settings
+from app.engine.db_storage import _pool_options
+from app.engine.instrumentation import instrument_engine
+
+
+# process-wide async engine and session factory, built once per worker process
+_engine = None
+_engine_pid = None
+_session_factory = None
+
+
+def async_db_url():
+    """Builds the asyncpg database URL from the settings."""
+    return (
+        f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}"
+        f"@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+    )
+
+
+def init_async_engine():
+    """
+    Desc:
+        builds the async engine and session factory shared by every
+        AsyncDBStorage in this process. Connections are opened lazily.
+    Return:
+        returns the shared async engine
+    """
+    global _engine, _engine_pid, _session_factory
+
+    if _engine is not None and _engine_pid == os.getpid():
+        return _engine
+
+    _engine = create_async_engine(async_db_url(), pool_pre_ping=True, **_pool_options())
+    # no strict loading needed here, implicit lazy loads already fail under asyncio
+    instrument_engine(_engine.sync_engine)
+    _engine_pid = os.getpid()
+    _session_factory = sessionmaker(
+        bind=_engine, class_=AsyncSession, expire_on_commit=False
+    )
+    return _engine
+
+
+async def dispose_async_engine():
+    """Closes every pooled connection of the shared async engine."""
+    global _engine, _engine_pid, _session_factory
+
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = _engine_pid = _session_factory = None
+
+
+class AsyncQuery:
+    """
+    A small awaitable stand-in for the legacy Query object returned by
+    DBStorage.query_eng, so routes keep the same chaining style:
+
+        user = await db.query_eng(User).filter(User.email == email).first()
+    """
+
+    def __init__(self, session, stmt):
+        self._session = session
+        self._stmt = stmt
+
+    def filter(self, *criteria):
+        return AsyncQuery(self._session, self._stmt.where(*criteria))
+
+    def options(self, *options):
+        return AsyncQuery(self._session, self._stmt.options(*options))
+
+    def order_by(self, *clauses):
+        return AsyncQuery(self._session, self._stmt.order_by(*clauses))
+
+    def limit(self, limit):
+        return AsyncQuery(self._session, self._stmt.limit(limit))
+
+    def with_for_update(self, **kwargs):
+        return AsyncQuery(self._session, self._stmt.with_for_update(**kwargs))
+
+    async def all(self):
+        result = await self._session.scalars(self._stmt)
+        return result.unique().all()
+
+    async def first(self):
+        result = await self._session.scalars(self._stmt.limit(1))
+        return result.unique().first()
+
+
+class AsyncDBStorage:
+    """
+    Same surface as DBStorage, but every database round trip is awaited
+    so async routes never block the event loop.
+    """
+
+    __session = None
+
+    def __init__(self, unit_of_work=False):
+        """
+        Attaches to the process-wide async engine, creating it on first use.
+
+        Parameters:
+            unit_of_work (bool): add/delete/update only stage changes, the
+            owner commits them all at once (see app.engine.load.load_async).
+        """
+        self.engine = init_async_engine()
+        self.unit_of_work = unit_of_work
+        self.__session = None
+
+    async def _autocommit(self):
+        """Commits right away unless changes are deferred to the unit of work."""
+        if not self.unit_of_work:
+            await self.__session.commit()
+
+    def query_eng(self, cls=None):
+        """
+        Creates an awaitable query for a specified model class.
+
+        Parameters:
+            cls (Base, optional): The model class to query in the database.
+
+        Returns:
+            AsyncQuery: supports filter/options/order_by/limit and awaitable first/all.
+        """
+        return AsyncQuery(self.__session, select(cls))
+
+    async def add(self, obj):
+        """
+        Adds a new object to the session and commits it to the database,
+        or leaves it for the request's single commit in unit-of-work mode.
+
+        Parameters:
+            obj (Base): An instance of a SQLAlchemy model to be added to the database.
+
+        Raises:
+            SQLAlchemyError: If the database operation fails.
+        """
+        try:
+            self.__session.add(obj)
+            await self._autocommit()
+        except exc.SQLAlchemyError as e:
+            await self.__session.rollback()
+            print(f"Failed to add object to database: {e}")
+            raise
+
+    async def delete(self, obj):
+        """
+        Removes an object from the session and the database.
+
+        Parameters:
+            obj (Base): An instance of a SQLAlchemy model to be deleted from the database.
+
+        Raises:
+            SQLAlchemyError: If the database operation fails.
+        """
+        try:
+            await self.__session.delete(obj)
+            await self._autocommit()
+        except exc.SQLAlchemyError as e:
+            await self.__session.rollback()
+            print(f"Failed to delete object from database: {e}")
+            raise
+
+    async def update(self, obj):
+        """
+        Updates an existing object in the session and commits changes to the database.
+
+        Parameters:
+            obj (Base): An instance of a SQLAlchemy model that has been modified.
+
+        Raises:
+            SQLAlchemyError: If the database operation fails.
+        """
+        try:
+            await self.__session.merge(obj)
+            await self._autocommit()
+        except exc.SQLAlchemyError as e:
+            await self.__session.rollback()
+            print(f"Failed to update object in database: {e}")
+            raise
+
+    async def find_by_id(self, cls, id):
+        """
+        Retrieves an object by its ID.
+
+        Parameters:
+            cls (Base): The class of the object to retrieve.
+            id (int): The primary key of the object in the database.
+
+        Returns:
+            instance of cls: The retrieved object, or None if no object found.
+        """
+        return await self.__session.get(cls, id)
+
+    def setup_db(self):
+        """
+        Desc:
+             checks out a session from the shared async factory
+        """
+        self.__session = _session_factory()
+
+    async def commit(self):
+        """
+        Desc:
+            commit changes
+        """
+        await self.__session.commit()
+
+    async def rollback(self):
+        """Rolls back the current transaction."""
+        await self.__session.rollback()
+
+    def after_commit(self, callback):
+        """
+        Runs callback() once the current transaction has committed, e.g. to
+        wake a background worker only when the new rows are visible to it.
+        """
+        event.listen(
+            self.__session.sync_session,
+            "after_commit",
+            lambda session: callback(),
+            once=True,
+        )
+
+    async def refresh(self, obj):
+        if self.unit_of_work:
+            # staged changes must reach the database before reloading the row
+            await self.__session.flush()
+        await self.__session.refresh(obj)
+
+    async def flush(self):
+        """Flushes the current session, ensuring any pending changes are sent to the database."""
+        await self.__session.flush()
+
+    async def close(self):
+        """
+        Desc:
+            closes the __session
+        """
+        await self.__session.close()
@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 
-from sqlalchemy import create_engine, exc
-from sqlalchemy.orm import sessionmaker, scoped_session
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event, exc, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, QueuePool
 
-from app.models.base_model import Base
 from app.config.config import settings
+from app.engine.instrumentation import enable_strict_loading, instrument_engine
 
 
 def db_credentials_are_set():
@@ -15,6 +20,190 @@ if not db_credentials_are_set():
     """checks if DB credentials are set in the .env file"""
     print("DB credentials are not set")
 
+
+# process-wide engine and session factory, built once per worker process
+_engine = None
+_engine_pid = None
+_session_factory = None
+_pool_counters = {"connects": 0, "checkouts": 0, "checkins": 0}
+
+# optional read replica, used by read-only storages while its lag is acceptable
+_replica_engine = None
+_replica_session_factory = None
+_replica_state = {"checked_at": None, "lag": None}
+_replica_lock = threading.Lock()
+
+# seconds of replay lag, 0 on a caught-up standby or a server that is not a standby
+REPLICA_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+def db_url():
+    """Builds the psycopg2 database URL from the settings."""
+    return (
+        f"postgresql+psycopg2://{settings.DB_USER}:{settings.DB_PASSWORD}"
+        f"@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
+    )
+
+
+def _pool_options():
+    """Returns the create_engine pool arguments configured in the settings."""
+    if settings.DB_USE_NULLPOOL:
+        # PgBouncer owns the pooling, every checkout opens a fresh connection
+        return {"poolclass": NullPool}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+def _count(name):
+    def listener(*args):
+        _pool_counters[name] += 1
+
+    return listener
+
+
+def init_engine():
+    """
+    Desc:
+        builds the engine and session factory shared by every DBStorage
+        in this process. Safe to call repeatedly, the engine is only
+        created once (or again after a fork, so workers never share sockets).
+    Return:
+        returns the shared engine
+    """
+    global _engine, _engine_pid, _session_factory
+    global _replica_engine, _replica_session_factory
+
+    if _engine is not None and _engine_pid == os.getpid():
+        return _engine
+    if _engine is not None:
+        # inherited from the parent process, drop its connections without closing them
+        _engine.dispose(close=False)
+    if _replica_engine is not None:
+        _replica_engine.dispose(close=False)
+
+    engine = create_engine(db_url(), pool_pre_ping=True, **_pool_options())
+    # attached before the check below, whose connection stays in the pool
+    event.listen(engine, "connect", _count("connects"))
+    event.listen(engine, "checkout", _count("checkouts"))
+    event.listen(engine, "checkin", _count("checkins"))
+    try:
+        # Attempt to connect to the database to verify that the engine is working.
+        with engine.connect() as conn:
+            pass
+    except exc.SQLAlchemyError as e:
+        print(f"Failed to connect to the database: {e}")
+        raise
+    instrument_engine(engine)
+
+    _engine = engine
+    _engine_pid = os.getpid()
+    _session_factory = sessionmaker(bind=engine, expire_on_commit=False)
+    enable_strict_loading(_session_factory)
+
+    if settings.DB_REPLICA_URL:
+        # connects lazily, an unreachable replica must not stop the app booting
+        _replica_engine = create_engine(
+            settings.DB_REPLICA_URL, pool_pre_ping=True, **_pool_options()
+        )
+        instrument_engine(_replica_engine)
+        _replica_session_factory = sessionmaker(
+            bind=_replica_engine, expire_on_commit=False
+        )
+        enable_strict_loading(_replica_session_factory)
+        _replica_state.update(checked_at=None, lag=None)
+    return _engine
+
+
+def dispose_engine():
+    """Closes every pooled connection of the shared engines."""
+    global _engine, _engine_pid, _session_factory
+    global _replica_engine, _replica_session_factory
+
+    if _engine is not None:
+        _engine.dispose()
+    if _replica_engine is not None:
+        _replica_engine.dispose()
+    _engine = _engine_pid = _session_factory = None
+    _replica_engine = _replica_session_factory = None
+
+
+def replica_lag():
+    """
+    Desc:
+        measures how far the replica is behind the primary. The result is
+        cached for DB_REPLICA_LAG_CHECK_SECONDS so reads don't pay for it.
+    Return:
+        returns the lag in seconds, or None if there is no usable replica
+    """
+    if _replica_engine is None:
+        return None
+
+    checked_at = _replica_state["checked_at"]
+    if checked_at is not None and (
+        time.monotonic() - checked_at < settings.DB_REPLICA_LAG_CHECK_SECONDS
+    ):
+        return _replica_state["lag"]
+
+    with _replica_lock:
+        # another thread may have refreshed it while we waited for the lock
+        checked_at = _replica_state["checked_at"]
+        if checked_at is not None and (
+            time.monotonic() - checked_at < settings.DB_REPLICA_LAG_CHECK_SECONDS
+        ):
+            return _replica_state["lag"]
+        try:
+            with _replica_engine.connect() as conn:
+                lag = float(conn.execute(REPLICA_LAG_SQL).scalar() or 0)
+        except exc.SQLAlchemyError as e:
+            print(f"Replica lag check failed, reading from the primary: {e}")
+            lag = None
+        _replica_state.update(checked_at=time.monotonic(), lag=lag)
+    return lag
+
+
+def replica_is_usable():
+    """True when a replica is configured, reachable and within the lag threshold."""
+    lag = replica_lag()
+    return lag is not None and lag <= settings.DB_REPLICA_MAX_LAG_SECONDS
+
+
+def pool_stats():
+    """
+    Desc:
+        reports the shared pool occupancy and lifetime checkout counters,
+        used to size DB_POOL_SIZE and DB_MAX_OVERFLOW
+    Return:
+        returns a dict of pool statistics
+    """
+    pool = init_engine().pool
+    stats = {"pool": type(pool).__name__, **_pool_counters}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + settings.DB_MAX_OVERFLOW
+        stats.update(
+            size=pool.size(),
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            occupancy=round(pool.checkedout() / capacity, 3) if capacity else None,
+        )
+    if _replica_engine is not None:
+        stats["replica_lag"] = replica_lag()
+    return stats
+
+
 class DBStorage:
     """
     Handles database operations including connection setup and session management,
@@ -24,27 +213,27 @@ class DBStorage:
     engine = None
     __session = None
 
-    def __init__(self):
-        """Initializes a database engine connection using environment variables"""
-        DB_USER = settings.DB_USER
-        DB_PASSOWRD = settings.DB_PASSWORD
-        DB_HOST = settings.DB_HOST
-        DB_NAME = settings.DB_NAME
-        DB_PORT = settings.DB_PORT
-        DB_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSOWRD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-
-        try:
-            self.engine = create_engine(DB_URL, pool_pre_ping=True)
-            # Attempt to connect to the database to verify that the engine is working.
-            with self.engine.connect() as conn:
-                pass
-        except exc.SQLAlchemyError as e:
-            print(f"Failed to connect to the database: {e}")
-            # manage the error appropriately
-            raise
+    def __init__(self, read_only=False, unit_of_work=False):
+        """
+        Attaches to the process-wide engine, creating it on first use.
 
+        Parameters:
+            read_only (bool): route this storage's session to the read replica
+            when one is configured and not lagging. Writes always belong on a
+            storage created without it.
+            unit_of_work (bool): add/delete/update only stage changes, the
+            owner commits them all at once (see app.engine.load.load).
+        """
+        self.engine = init_engine()
+        self.read_only = read_only
+        self.unit_of_work = unit_of_work
         self.__session = None
 
+    def _autocommit(self):
+        """Commits right away unless changes are deferred to the unit of work."""
+        if not self.unit_of_work:
+            self.__session.commit()
+
     def all(self, cls=None):
         """
         Desc:
@@ -85,7 +274,8 @@ class DBStorage:
 
     def add(self, obj):
         """
-        Adds a new object to the session and commits it to the database.
+        Adds a new object to the session and commits it to the database,
+        or leaves it for the request's single commit in unit-of-work mode.
 
         Parameters:
             obj (Base): An instance of a SQLAlchemy model to be added to the database.
@@ -95,7 +285,7 @@ class DBStorage:
         """
         try:
             self.__session.add(obj)
-            self.__session.commit()
+            self._autocommit()
         except exc.SQLAlchemyError as e:
             self.__session.rollback()
             print(f"Failed to add object to database: {e}")
@@ -113,7 +303,7 @@ class DBStorage:
         """
         try:
             self.__session.delete(obj)
-            self.__session.commit()
+            self._autocommit()
         except exc.SQLAlchemyError as e:
             self.__session.rollback()
             print(f"Failed to delete object from database: {e}")
@@ -131,7 +321,7 @@ class DBStorage:
         """
         try:
             self.__session.merge(obj)
-            self.__session.commit()
+            self._autocommit()
         except exc.SQLAlchemyError as e:
             self.__session.rollback()
             print(f"Failed to update object in database: {e}")
@@ -153,12 +343,14 @@ class DBStorage:
     def setup_db(self):
         """
         Desc:
-             init/load connection
+             checks out a session from the shared factory, or from the
+             replica's for read-only storages. The schema is managed by
+             Alembic only, see app.engine.schema
         """
-        Base.metadata.create_all(self.engine)
-        sec = sessionmaker(bind=self.engine, expire_on_commit=False)
-        Session = scoped_session(sec)
-        self.__session = Session()
+        if self.read_only and replica_is_usable():
+            self.__session = _replica_session_factory()
+        else:
+            self.__session = _session_factory()
 
     def commit(self):
         """
@@ -167,7 +359,23 @@ class DBStorage:
         """
         self.__session.commit()
 
+    def rollback(self):
+        """Rolls back the current transaction."""
+        self.__session.rollback()
+
+    def after_commit(self, callback):
+        """
+        Runs callback() once the current transaction has committed, e.g. to
+        invalidate caches only when the new data is actually visible.
+        """
+        event.listen(
+            self.__session, "after_commit", lambda session: callback(), once=True
+        )
+
     def refresh(self, obj):
+        if self.unit_of_work:
+            # staged changes must reach the database before reloading the row
+            self.__session.flush()
         self.__session.refresh(obj)
 
     def flush(self):
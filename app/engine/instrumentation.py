@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Per-request SQL instrumentation.
+
+Engine events count and time every statement into a QueryStats object that
+lives in a context variable for the duration of one request. The middleware
+reports the numbers in response headers and a structured log line, and flags
+statements repeated often enough to look like an N+1 pattern.
+
+With SQL_STRICT_LOADING on, relationships that were not eager loaded raise
+instead of quietly issuing a query when touched.
+"""
+
+import json
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.orm import raiseload
+
+from app.config.config import settings
+
+
+logger = logging.getLogger("app.sql")
+
+_current_stats = ContextVar("sql_stats", default=None)
+
+
+class QueryStats:
+    """Statement count, total time and repeat counts for one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def record(self, statement, duration):
+        self.count += 1
+        self.duration += duration
+        self.statements[statement] += 1
+
+    def repeated(self, threshold=None):
+        """Statements issued at least `threshold` times, most frequent first."""
+        threshold = threshold or settings.SQL_N_PLUS_ONE_THRESHOLD
+        return [
+            (statement, count)
+            for statement, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info["query_start"].pop()
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, time.perf_counter() - start)
+
+
+def instrument_engine(engine):
+    """Attaches the statement counters to a (sync) engine."""
+    if not settings.SQL_INSTRUMENTATION:
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _raise_on_lazy_load(orm_execute_state):
+    if (
+        orm_execute_state.is_select
+        and not orm_execute_state.is_column_load
+        and not orm_execute_state.is_relationship_load
+    ):
+        # explicit joinedload/selectinload options still win over the wildcard
+        orm_execute_state.statement = orm_execute_state.statement.options(
+            raiseload("*", sql_only=True)
+        )
+
+
+def enable_strict_loading(session_factory):
+    """Makes un-eager-loaded relationships raise for sessions of this factory."""
+    if settings.SQL_STRICT_LOADING:
+        event.listen(session_factory, "do_orm_execute", _raise_on_lazy_load)
+
+
+async def sql_stats_middleware(request, call_next):
+    """
+    Collects the SQL statistics of a request and reports them as
+    X-DB-Query-Count / X-DB-Query-Time-Ms / Server-Timing headers and a log line.
+    """
+    if not settings.SQL_INSTRUMENTATION:
+        return await call_next(request)
+
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        response = await call_next(request)
+    finally:
+        _current_stats.reset(token)
+
+    duration_ms = round(stats.duration * 1000, 2)
+    repeated = stats.repeated()
+    response.headers["X-DB-Query-Count"] = str(stats.count)
+    response.headers["X-DB-Query-Time-Ms"] = str(duration_ms)
+    response.headers["Server-Timing"] = f"db;dur={duration_ms}"
+    if repeated:
+        response.headers["X-DB-Repeated-Queries"] = str(len(repeated))
+
+    record = {
+        "method": request.method,
+        "path": request.url.path,
+        "status": response.status_code,
+        "queries": stats.count,
+        "db_ms": duration_ms,
+    }
+    if repeated:
+        record["n_plus_one"] = [
+            {"statement": statement[:200], "count": count}
+            for statement, count in repeated
+        ]
+        logger.warning(json.dumps(record))
+    else:
+        logger.info(json.dumps(record))
+    return response
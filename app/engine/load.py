@@ -1,15 +1,55 @@
 #!/usr/bin/env python
 
+from .async_db_storage import AsyncDBStorage
 from .db_storage import DBStorage
 
 
 def load():
     """
     Context manager to initialize and safely close the database connection.
+
+    The storage runs as a unit of work: everything the request adds,
+    updates or deletes is committed in a single transaction once the route
+    returns, and rolled back if it raises.
+    """
+    db = DBStorage(unit_of_work=True)
+    db.setup_db()
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def load_replica():
     """
-    db = DBStorage()
+    Same as load, but for read-only routes: the session goes to the read
+    replica when one is configured and caught up, otherwise to the primary.
+    """
+    db = DBStorage(read_only=True)
     db.setup_db()
     try:
         yield db
     finally:
         db.close()
+
+
+async def load_async():
+    """
+    Async counterpart of load, for `async def` routes. Yields an
+    AsyncDBStorage whose queries are awaited instead of blocking the loop,
+    committed once when the route returns.
+    """
+    db = AsyncDBStorage(unit_of_work=True)
+    db.setup_db()
+    try:
+        yield db
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""startup check that the database schema is at the Alembic head revision"""
+
+import os
+
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+
+ALEMBIC_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "alembic"
+)
+
+
+def check_schema_revision(engine):
+    """
+    Desc:
+        compares the revision stamped in alembic_version with the head
+        revision(s) of the migration scripts. This is a single indexed
+        read, the schema itself is only ever changed by `alembic upgrade`.
+    Raises:
+        RuntimeError: if the database is not at the head revision
+    """
+    heads = set(ScriptDirectory(ALEMBIC_DIR).get_heads())
+    with engine.connect() as conn:
+        current = set(MigrationContext.configure(conn).get_current_heads())
+
+    if current != heads:
+        raise RuntimeError(
+            f"Database is at revision {sorted(current) or 'base'}, expected "
+            f"{sorted(heads)}. Run `alembic upgrade head` before starting the app."
+        )
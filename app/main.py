@@ -1,9 +1,49 @@
-from fastapi import FastAPI
-from app.routers import customer, auth, product, payment
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
+from app.config.config import settings
+from app.engine.async_db_storage import dispose_async_engine, init_async_engine
+from app.engine.db_storage import dispose_engine, init_engine, pool_stats
+from app.engine.instrumentation import sql_stats_middleware
+from app.engine.schema import check_schema_revision
+from app.models.user import User
+from app.routers import customer, auth, product, payment, upload
+from app.utils.auth import check_authorization, password_pool
+from app.utils.emails import build_templates, smtp_pool
+from app.utils.image_variants import image_variant_pool
+from app.utils.outbox import outbox_worker
+from app.utils.password_pool import calibrate_rounds
 from fastapi.middleware.cors import CORSMiddleware
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one engine and connection pool per worker process
+    engine = init_engine()
+    if settings.DB_CHECK_MIGRATIONS:
+        check_schema_revision(engine)
+    init_async_engine()
+    rounds = settings.PASSWORD_HASH_ROUNDS or calibrate_rounds(
+        settings.PASSWORD_HASH_TARGET_MS,
+        settings.PASSWORD_HASH_MIN_ROUNDS,
+        settings.PASSWORD_HASH_MAX_ROUNDS,
+    )
+    password_pool.start(rounds)
+    if settings.IMAGE_VARIANTS_ENABLED:
+        image_variant_pool.start()
+    build_templates()
+    if settings.OUTBOX_WORKER_ENABLED:
+        outbox_worker.start()
+    yield
+    await outbox_worker.stop()
+    await smtp_pool.close()
+    password_pool.shutdown()
+    image_variant_pool.shutdown()
+    await dispose_async_engine()
+    dispose_engine()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,7 +55,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
+app.middleware("http")(sql_stats_middleware)
 
 
 @app.get("/")
@@ -23,7 +65,32 @@ def hello():
     return {"message": "Hello, World!"}
 
 
+@app.get("/db_pool")
+def db_pool(user: User = Depends(check_authorization("admin"))):
+    """Connection pool occupancy and checkout counters for this worker."""
+    return pool_stats()
+
+
+@app.get("/password_pool")
+def password_pool_stats(user: User = Depends(check_authorization("admin"))):
+    """bcrypt worker pool queue depth and outcome counters for this worker."""
+    return password_pool.stats()
+
+
+@app.get("/email_pool")
+def email_pool_stats(user: User = Depends(check_authorization("admin"))):
+    """SMTP session reuse and send latency for this worker."""
+    return smtp_pool.stats()
+
+
+@app.get("/image_variants")
+def image_variant_stats(user: User = Depends(check_authorization("admin"))):
+    """Resized image jobs queued and done by this worker."""
+    return image_variant_pool.stats()
+
+
 app.include_router(auth.router)
 app.include_router(customer.router)
 app.include_router(product.router)
 app.include_router(payment.router)
+app.include_router(upload.router)
@@ -9,7 +9,7 @@ class Cart(BaseModel, Base):
     customer_id = Column(
         String, ForeignKey("customers.id"), nullable=False, primary_key=True
     )
-    product_id = Column(String, ForeignKey("products.id"), nullable=False)
+    product_id = Column(String, ForeignKey("products.id"), nullable=False, index=True)
     quantity = Column(Integer, nullable=False)
     status = Column(String, nullable=True)
     paid_at = Column(String, nullable=True)
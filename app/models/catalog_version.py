@@ -0,0 +1,12 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer
+
+from app.models.base_model import Base
+
+
+class CatalogVersion(Base):
+    """single-row counter bumped in the same transaction as every catalog write"""
+
+    __tablename__ = "catalog_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
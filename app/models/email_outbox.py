@@ -0,0 +1,31 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.models.base_model import BaseModel, Base
+
+
+class EmailOutbox(BaseModel, Base):
+    """
+    outgoing mail, stored in the same transaction as the change that sends
+    it and delivered in the background by app.utils.outbox
+    """
+
+    __tablename__ = "email_outbox"
+    recipient = Column(String, nullable=False)
+    subject = Column(String, nullable=False)
+    template = Column(String, nullable=False)
+    context = Column(JSONB, nullable=False, default=dict)
+    # pending -> sent, or failed once the attempts are used up
+    status = Column(String(16), nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    last_error = Column(Text, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+
+
+# the worker only ever scans the pending rows that are due
+Index(
+    "ix_email_outbox_pending_due",
+    EmailOutbox.next_attempt_at,
+    postgresql_where=EmailOutbox.status == "pending",
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String
+from sqlalchemy import Column, Index, String
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 
@@ -10,5 +10,10 @@ class Fabric(BaseModel, Base):
     name = Column(String, nullable=False)
     category = Column(String, nullable=True)
     images = Column(JSONB, nullable=True)
+    # image URL -> its resized copies, see app.utils.image_variants
+    image_variants = Column(JSONB, nullable=True)
 
     prices = relationship("FabricPrice", back_populates="fabric")
+
+
+Index("ix_fabrics_created_at_id", Fabric.created_at, Fabric.id)
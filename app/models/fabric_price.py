@@ -6,10 +6,10 @@ from app.models.base_model import BaseModel, Base
 
 class FabricPrice(BaseModel, Base):
     __tablename__ = "fabric_prices"
-    fabric_id = Column(String, ForeignKey("fabrics.id"), nullable=False)
+    fabric_id = Column(String, ForeignKey("fabrics.id"), nullable=False, index=True)
     price = Column(Float, nullable=False)
     product_category_id = Column(
-        String, ForeignKey("product_categories.id"), nullable=False
+        String, ForeignKey("product_categories.id"), nullable=False, index=True
     )
 
     fabric = relationship("Fabric", back_populates="prices")
@@ -28,5 +28,7 @@ class Measurement(BaseModel, Base):
     ankle = Column(Float, nullable=True)
     pant_length = Column(Float, nullable=True)
     images = Column(MutableList.as_mutable(JSONB), nullable=True)
+    # image URL -> its resized copies, see app.utils.image_variants
+    image_variants = Column(JSONB, nullable=True)
 
     customer = relationship("Customer", back_populates="measurement")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Float, ForeignKey, String
+from sqlalchemy import Column, Float, ForeignKey, Index, String
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSONB
 
@@ -13,8 +13,13 @@ class Product(BaseModel, Base):
     name = Column(String, nullable=False)
     price = Column(Float, nullable=False)
     description = Column(String, nullable=True)
-    category_id = Column(String, ForeignKey("product_categories.id"))
+    category_id = Column(String, ForeignKey("product_categories.id"), index=True)
     images = Column(JSONB, nullable=True, default=lambda: [DEFAULT_STOCK_IMAGE_URL])
+    # image URL -> its resized copies, see app.utils.image_variants
+    image_variants = Column(JSONB, nullable=True)
 
     cart = relationship("Cart", back_populates="product")
     category = relationship("ProductCategory", back_populates="products")
+
+
+Index("ix_products_created_at_id", Product.created_at, Product.id)
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-from sqlalchemy import Column, String, Boolean
+from sqlalchemy import Column, String, Boolean, Index, func
 
 from app.models.base_model import BaseModel, Base
 
@@ -12,4 +12,12 @@ class User(BaseModel, Base):
     password_hash = Column(String(128), nullable=False)
     is_verified = Column(Boolean, default=False)
     role = Column(String(32), nullable=False)
-   
\ No newline at end of file
+
+    @classmethod
+    def email_matches(cls, email):
+        """Case-insensitive email filter, served by the ix_users_email_lower index"""
+        return func.lower(cls.email) == email.strip().lower()
+
+
+Index("ix_users_email_lower", func.lower(User.email), unique=True)
+Index("ix_users_created_at_id", User.created_at, User.id)
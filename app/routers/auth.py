@@ -6,10 +6,12 @@ from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import EmailStr
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.engine.load import load
+from app.engine.load import load, load_async
 from app.config.config import settings
+from app.models.customer import Customer
 from app.models.user import User
 from app.schema.auth import Token
 from app.schema.customer import ShowCustomer
@@ -17,10 +19,12 @@ from app.utils.auth import (
     authenticate_user,
     create_access_token,
     get_current_user,
+    invalidate_principal,
     set_access_cookies,
     delete_access_cookies,
 )
 from app.utils.emails import Email
+from app.utils.throttle import client_ip, login_throttle
 from app.utils.auth import send_verification_mail, verify_token
 
 
@@ -28,10 +32,11 @@ router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
 @router.post("/token")
-def login(
+async def login(
+    request: Request,
     response: Response,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(load),
+    db: AsyncSession = Depends(load_async),
 ) -> Token:
     """
     Login endpoint.
@@ -40,23 +45,29 @@ def login(
     If the credentials are valid, it generates an access token and sets it as a cookie in the response.
 
     Parameters:
+    - request (Request): The incoming request, used for the client address.
     - response (Response): The FastAPI response object.
     - form_data (OAuth2PasswordRequestForm): The form data containing the username and password.
-    - db (Session): The database session.
+    - db (AsyncSession): The database session.
 
     Returns:
     - Token: A Token object containing the access token and token type.
 
     Raises:
-    - HTTPException: If the username or password is incorrect.
+    - HTTPException: If the username or password is incorrect, 429 if the client or
+      account made too many attempts, or 503 if the password worker pool is saturated.
     """
-    user = authenticate_user(form_data.username.strip().lower(), form_data.password, db)
+    email = form_data.username.strip().lower()
+    # throttled before any database or bcrypt work
+    await login_throttle.check(client_ip(request), email)
+    user = await authenticate_user(email, form_data.password, db)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=[{"msg": "Incorrect username or password"}],
             headers={"WWW-Authenticate": "Bearer"},
         )
+    await login_throttle.succeeded(email)
     if not user.is_verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -84,18 +95,19 @@ def verify_email(token: str, db: Session = Depends(load)):
         return RedirectResponse(url="dev.joshsamuels.co/signup/error")
     else:
         email = result["email"]
-        user = db.query_eng(User).filter(User.email == email).first()
+        user = db.query_eng(User).filter(User.email_matches(email)).first()
         if user is None:
             return RedirectResponse(url="https://dev.joshsamuels.co/signup/error")
         user.is_verified = True
         db.update(user)
+        db.after_commit(lambda: invalidate_principal(user.id))
 
     return RedirectResponse(url="https://dev.joshsamuels.co/signup/success")
 
 
 @router.get("/resened_verification_mail")
 async def resend_verification_mail(
-    http_request: Request, email: EmailStr, db: Session = Depends(load)
+    http_request: Request, email: EmailStr, db: AsyncSession = Depends(load_async)
 ):
     """
     Resend verification email endpoint.
@@ -108,16 +120,23 @@ async def resend_verification_mail(
     - user (ShowUser): The current user object. This is obtained using the `get_current_user` dependency.
 
     Raises:
-    - HTTPException: If the email sending fails.
+    - HTTPException: If no customer has this email address.
+
+    The email is queued in the outbox and sent in the background.
     """
-    user = db.query_eng(User).filter(User.email == email).first()
+    user = await db.query_eng(User).filter(User.email_matches(email)).first()
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=[{"msg": "User not found."}]
         )
 
-    user = db.query_eng(User).filter(User.id == user.id).first()
-    message = await send_verification_mail(user.email, http_request, user)
+    # the mail greets the customer by first name, which lives on the customers row
+    customer = await db.query_eng(Customer).filter(Customer.id == user.id).first()
+    if customer is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail=[{"msg": "User not found."}]
+        )
+    message = await send_verification_mail(user.email, http_request, customer, db)
 
     return {"message": message}
 
@@ -1,17 +1,24 @@
 #!/usr/bin/env python3
 
-import base64
-import binascii
-from typing import Optional
-import uuid
-
-import boto3
-
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from typing import List, Optional
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config.config import settings
-from app.engine.load import load
+from app.engine.load import load, load_async, load_replica
 from app.models.measurements import Measurement
 from app.models.user import User
 from app.models.cart import Cart  # This is to avoid sqlalchemy.exc.InvalidRequestError
@@ -21,23 +28,24 @@ from app.schema.customer import (
     CreateCustomer,
     ShowCustomer,
     UpdateCustomer,
+    MeasurementFields,
     MeasurementSchema,
 )
 from app.utils import auth
+from app.utils.pagination import paginate
+from app.utils.forms import parse_form_json
+from app.utils.image_variants import derive_variants
+from app.utils.s3 import stream_form_images, upload_base64_images
 
 
 router = APIRouter(prefix="/customer", tags=["Customer Management"])
-s3_client = boto3.client(
-    "s3",
-    region_name=settings.S3_REGION,
-    aws_access_key_id=settings.S3_ACCESS_KEY,
-    aws_secret_access_key=settings.S3_SECRET_KEY,
-)
 
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
 async def register(
-    request: CreateCustomer, http_request: Request, db: Session = Depends(load)
+    request: CreateCustomer,
+    http_request: Request,
+    db: AsyncSession = Depends(load_async),
 ):
     """
     Parameters:
@@ -54,16 +62,16 @@ async def register(
     If such a user is found, it raises an HTTPException with a status code of 409 (Conflict)
     and a message indicating the existence of the duplicate user.
 
-    If no such user is found, the function hashes the password using the `auth.get_password_hash`
-    function and creates a new `custmer` object with the provided details.
+    If no such user is found, the function hashes the password on the bcrypt worker pool using
+    the `auth.hash_password` function and creates a new `custmer` object with the provided details.
     It then adds the new admin user to the database session and returns the newly created admin user as an object.
     Note that password has to be at least 8 characters and include alphabets, numbers, and a special character.
     """
     phone = request.phone
     email = request.email.strip().lower()
 
-    check_phone = db.query_eng(User).filter(User.phone == phone).first()
-    check_email = db.query_eng(User).filter(User.email == email).first()
+    check_phone = await db.query_eng(User).filter(User.phone == phone).first()
+    check_email = await db.query_eng(User).filter(User.email_matches(email)).first()
 
     if check_phone:
         raise HTTPException(
@@ -75,18 +83,18 @@ async def register(
             status_code=status.HTTP_409_CONFLICT,
             detail=[{"msg": f"user with email: {email} exists"}],
         )
-    password_hash = auth.get_password_hash(request.password1.get_secret_value())
-    message = await auth.send_verification_mail(email, http_request, request)
+    password_hash = await auth.hash_password(request.password1.get_secret_value())
+    message = await auth.send_verification_mail(email, http_request, request, db)
 
     new_customer = Customer(
         first_name=request.first_name,
         last_name=request.last_name,
         phone=request.phone,
-        email=request.email,
+        email=email,
         password_hash=password_hash,
         role="customer",
     )
-    db.add(new_customer)
+    await db.add(new_customer)
     return {"first_name": request.first_name, "email": email, "message": message}
 
 
@@ -111,6 +119,8 @@ def update_measurement(
 
     If the 'image' field is provided in the request, the function checks if the value is a valid base64-encoded image.
     If it is, the function converts the base64 string to binary and stores the image header separately.
+    New images are uploaded to S3 concurrently; objects already written are kept and reused on retry,
+    see upload_base64_images.
 
     If any error occurs during the process, an HTTPException is raised with an appropriate status code and error message.
     """
@@ -118,37 +128,18 @@ def update_measurement(
         db.query_eng(Measurement).filter(Measurement.customer_id == user.id).first()
     )
     if measurements:
-        image_urls = measurements.images or []
-        print(image_urls)
+        image_urls = list(measurements.images or [])
         for key, value in request.model_dump(exclude_unset=True).items():
             if value not in (None, ""):
                 if key == "images":
-                    for index, image_base64 in enumerate(value):
-                        if image_base64.startswith("data:image"):
-                            try:
-                                header, image_data = image_base64.split(";base64,")
-                                file_extension = header.split("/")[1]
-                                image_data = base64.b64decode(image_data)
-                                clean_email = user.email.replace(" ", "_")
-                                unique_filename = f"{clean_email + str(uuid.uuid4())[:6]}.{file_extension}"
-
-                                s3_client.put_object(
-                                    Bucket=settings.S3_BUCKET_NAME,
-                                    Key=unique_filename,
-                                    Body=image_data,
-                                    ContentType=f"image/{file_extension}",
-                                )
-
-                                file_url = f"https://{settings.S3_BUCKET_NAME}.s3.{settings.S3_REGION}.amazonaws.com/{unique_filename}"
-                                image_urls.append(file_url)
-                                print("in loop after apppend")
-                                print(image_urls)
-
-                            except Exception as e:
-                                raise HTTPException(
-                                    status_code=400,
-                                    detail=f"Failed to process image {index+1}: {str(e)}",
-                                )
+                    new_images = [
+                        image_base64
+                        for image_base64 in value
+                        if image_base64.startswith("data:image")
+                    ]
+                    new_urls = upload_base64_images(new_images)
+                    derive_variants(db, measurements, new_urls)
+                    image_urls += new_urls
                     setattr(measurements, key, image_urls)
                 else:
                     setattr(measurements, key, value)
@@ -156,49 +147,70 @@ def update_measurement(
         db.refresh(measurements)
         return measurements
     else:
-        image_urls = []
-        for index, image_base64 in enumerate(request.images):
-            try:
-                header, image_data = image_base64.split(";base64,")
-                file_extension = header.split("/")[1]
-                image_data = base64.b64decode(image_data)
-                clean_email = user.email.replace(" ", "_")
-                unique_filename = (
-                    f"{clean_email + str(uuid.uuid4())[:6]}.{file_extension}"
-                )
-
-                s3_client.put_object(
-                    Bucket=settings.S3_BUCKET_NAME,
-                    Key=unique_filename,
-                    Body=image_data,
-                    ContentType=f"image/{file_extension}",
-                )
-
-                # Construct the file URL
-                file_url = f"https://{settings.S3_BUCKET_NAME}.s3.{settings.S3_REGION}.amazonaws.com/{unique_filename}"
-                image_urls.append(file_url)
-
-            except Exception as e:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Failed to process image {index+1}: {str(e)}",
-                )
+        image_urls = upload_base64_images(request.images)
         new_measurements = Measurement(
             customer_id=user.id,
             images=image_urls,
             **request.model_dump(exclude="images"),
         )
         db.add(new_measurements)
+        derive_variants(db, new_measurements, image_urls)
         return new_measurements
 
 
+@router.patch("/update_measurement_form", status_code=status.HTTP_200_OK)
+def update_measurement_form(
+    data: str = Form(...),
+    images: List[UploadFile] = File(default=[]),
+    db: Session = Depends(load),
+    user: User = Depends(auth.get_current_user),
+):
+    """
+    Multipart/form-data variant of update_measurement.
+
+    Parameters:
+    - data (str): The measurements as JSON, see MeasurementFields.
+    - images (List[UploadFile]): New images as binary file parts; they are appended to the stored ones.
+    - db (Session): A database session object.
+    - user (User): The current user object.
+
+    Returns:
+    - Measurement: An object containing the updated measurement details.
+
+    The image parts are streamed to S3 concurrently, see stream_form_images, before the record is
+    touched, so a failed upload leaves the stored measurements as they were. Objects already written
+    are kept and reused on retry.
+    """
+    request = parse_form_json(MeasurementFields, data)
+    image_urls = stream_form_images(images)
+    measurements = (
+        db.query_eng(Measurement).filter(Measurement.customer_id == user.id).first()
+    )
+    if measurements:
+        for key, value in request.model_dump(exclude_unset=True).items():
+            if value not in (None, ""):
+                setattr(measurements, key, value)
+        if image_urls:
+            measurements.images = list(measurements.images or []) + image_urls
+            derive_variants(db, measurements, image_urls)
+        db.add(measurements)
+        db.refresh(measurements)
+        return measurements
+    new_measurements = Measurement(
+        customer_id=user.id, images=image_urls, **request.model_dump()
+    )
+    db.add(new_measurements)
+    derive_variants(db, new_measurements, image_urls)
+    return new_measurements
+
+
 @router.get(
     "/get_measurements",
     response_model=MeasurementSchema,
     status_code=status.HTTP_200_OK,
 )
 def get_measurements(
-    db: Session = Depends(load), user: User = Depends(auth.get_current_user)
+    db: Session = Depends(load_replica), user: User = Depends(auth.get_current_user)
 ):
     measurement = (
         db.query_eng(Measurement).filter(Measurement.customer_id == user.id).first()
@@ -221,7 +233,7 @@ def add_product(
 
 @router.get("/profile", response_model=ShowCustomer, status_code=status.HTTP_200_OK)
 def get_profile(
-    db: Session = Depends(load), user: User = Depends(auth.get_current_user)
+    db: Session = Depends(load_replica), user: User = Depends(auth.get_current_user)
 ):
     """
     Parameters:
@@ -251,14 +263,25 @@ def update_profile(
         setattr(customer, field, value)
 
     db.add(customer)
+    db.after_commit(lambda: auth.invalidate_principal(user.id))
     return {"message": "Profile updated successfully!"}
 
 
 @router.get("/all", status_code=status.HTTP_200_OK)
 def get_all_customers(
-    db: Session = Depends(load), user: User = Depends(auth.check_authorization("admin"))
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: Session = Depends(load),
+    user: User = Depends(auth.check_authorization("admin")),
 ):
-    return db.query_eng(Customer).all()
+    # customers inherit created_at/id from users, where the pagination index lives
+    customers, next_cursor = paginate(
+        db.query_eng(Customer), User.created_at, User.id, cursor, limit
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return customers
 
 
 @router.get("/measurement/{id}", status_code=status.HTTP_200_OK)
@@ -3,9 +3,10 @@ import hmac
 import json
 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.engine.load import load
+from app.engine.load import load, load_async
 from app.config.config import settings
 from app.models.product import Product
 from app.models.cart import Cart
@@ -30,7 +31,7 @@ def initialize_payment(request: Order_id, db: Session = Depends(load)):
 
 
 @router.post("/paystack_webhook")
-async def paystack_webhook(request: Request, db: Session = Depends(load)):
+async def paystack_webhook(request: Request, db: AsyncSession = Depends(load_async)):
     try:
         payload = await request.body()
 
@@ -59,7 +60,7 @@ async def paystack_webhook(request: Request, db: Session = Depends(load)):
         reference = data.get("reference")
         try:
             # Find the order based on the unique reference number
-            order = db.query_eng(Cart).filter(Cart.id == reference).first()
+            order = await db.query_eng(Cart).filter(Cart.id == reference).first()
 
             if not order:
                 raise HTTPException(status_code=404, detail="Order not found.")
@@ -69,10 +70,10 @@ async def paystack_webhook(request: Request, db: Session = Depends(load)):
             order.paid_at = data.get("paid_at")
             order.amount_paid = data.get("amount") / 100
 
-            db.add(order)
+            await db.add(order)
 
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=500, detail=f"Error updating order: {str(e)}"
             )
@@ -1,8 +1,6 @@
-import base64
 from typing import List
 import uuid
 
-import boto3
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
 
 from fastapi import (
@@ -11,37 +9,52 @@ from fastapi import (
     File,
     Form,
     HTTPException,
+    Query,
+    Request,
     UploadFile,
     status,
 )
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import joinedload, Session
 
 from app.config.config import settings
-from app.engine.load import load
+from app.engine.load import load, load_replica
 from app.models.fabric import Fabric
 from app.models.fabric_price import FabricPrice
+from app.models.measurements import Measurement
 from app.models.product import Product
 from app.models.product_category import ProductCategory
 from app.models.user import User
 from app.schema.product import (
     ProductCategorySchema,
+    ProductFields,
     ProductSchema,
+    FabricFields,
     FabricPriceData,
     FabricSchema,
 )
 from app.utils import auth
+from app.utils.catalog import (
+    bump_catalog_version,
+    catalog_cache,
+    catalog_response,
+    catalog_version,
+    invalidate_catalog,
+)
+from app.utils.catalog_import import import_catalog
+from app.utils.pagination import paginate
+from app.utils.forms import parse_form_json
+from app.utils.image_variants import (
+    backfill_variants,
+    derive_variants,
+    image_srcsets,
+    image_variant_pool,
+)
+from app.utils.s3 import stream_form_images, stream_upload, upload_base64_images
 
 
 router = APIRouter(prefix="/product", tags=["Product Management"])
 
-s3_client = boto3.client(
-    "s3",
-    region_name=settings.S3_REGION,
-    aws_access_key_id=settings.S3_ACCESS_KEY,
-    aws_secret_access_key=settings.S3_SECRET_KEY,
-)
-
-
 @router.post("/add_category", status_code=status.HTTP_201_CREATED)
 def add_category(
     request: ProductCategorySchema,
@@ -63,6 +76,7 @@ def add_category(
     """
     new_category = ProductCategory(name=request.name)
     db.add(new_category)
+    bump_catalog_version(db)
     return new_category
 
 
@@ -91,46 +105,63 @@ def add_product(
 
     Raises:
         HTTPException: If an error occurs while processing any of the images, a 400 error is raised with details.
+        The images are uploaded concurrently; objects already written are kept and reused on retry,
+        see upload_base64_images.
 
     Returns:
         Product:
     """
-    image_urls = []
-
-    for index, image_base64 in enumerate(request.images):
-        try:
-            header, image_data = image_base64.split(";base64,")
-            file_extension = header.split("/")[1]
-            image_data = base64.b64decode(image_data)
-            clean_name = request.name.replace(" ", "_")
-            clean_category = request.category_id.replace(" ", "_")
-            unique_filename = f"{clean_name + clean_category + str(uuid.uuid4())[:6]}.{file_extension}"
-
-            s3_client.put_object(
-                Bucket=settings.S3_BUCKET_NAME,
-                Key=unique_filename,
-                Body=image_data,
-                ContentType=f"image/{file_extension}",
-            )
+    # checked first, so a bad category never leaves uploaded images behind
+    product_category = check_product_category(db, request.category_id)
+    image_urls = upload_base64_images(request.images)
+    return save_product(request, product_category, image_urls, db)
 
-            # Construct the file URL
-            file_url = f"https://{settings.S3_BUCKET_NAME}.s3.{settings.S3_REGION}.amazonaws.com/{unique_filename}"
-            image_urls.append(file_url)
 
-        except Exception as e:
-            raise HTTPException(
-                status_code=400, detail=f"Failed to process image {index+1}: {str(e)}"
-            )
+@router.post("/add_product_form", status_code=status.HTTP_201_CREATED)
+def add_product_form(
+    data: str = Form(...),
+    images: List[UploadFile] = File(default=[]),
+    db: Session = Depends(load),
+    user: User = Depends(auth.check_authorization("admin")),
+):
+    """
+    Multipart/form-data variant of add_product.
+
+    Args:
+        data (str): The product as JSON, see ProductFields (name, price, description, category_id).
+        images (List[UploadFile]): The images as binary file parts, in display order.
+        db (Session): SQLAlchemy database session used for querying and committing changes.
+        user (User): The authenticated user making the request, which must have 'admin' privileges.
+
+    Raises:
+        HTTPException: 400 if the category does not exist, a part is not an allowed image or
+        an upload fails. The images are streamed to S3 concurrently; objects already written are
+        kept and reused on retry, see stream_form_images.
+
+    Returns:
+        Product:
+
+    The image parts are streamed to S3 in chunks instead of travelling as base64 text in
+    the JSON body, so memory use grows with the part size rather than with the payload.
+    """
+    request = parse_form_json(ProductFields, data)
+    product_category = check_product_category(db, request.category_id)
+    image_urls = stream_form_images(images)
+    return save_product(request, product_category, image_urls, db)
+
+
+def check_product_category(db, category_id: str) -> ProductCategory:
     product_category = (
-        db.query_eng(ProductCategory)
-        .filter(ProductCategory.id == request.category_id)
-        .first()
+        db.query_eng(ProductCategory).filter(ProductCategory.id == category_id).first()
     )
     if not product_category:
         raise HTTPException(
-            status_code=400, detail=f"Category '{request.category_id}' does not exist."
+            status_code=400, detail=f"Category '{category_id}' does not exist."
         )
+    return product_category
+
 
+def save_product(request, product_category, image_urls, db) -> Product:
     new_product = Product(
         name=request.name,
         description=request.description,
@@ -139,21 +170,46 @@ def add_product(
         images=image_urls,
     )
     db.add(new_product)
+    bump_catalog_version(db)
+    derive_variants(db, new_product, image_urls)
     return new_product
 
 
 @router.get("/get_products")
-def get_products(db: Session = Depends(load)):
+def get_products(
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: Session = Depends(load_replica),
+):
     """
-    Retrieves all products from the database.
+    Retrieves one page of products, oldest first.
 
     Args:
+        cursor (str, optional): The `X-Next-Cursor` header of the previous page.
+        limit (int): The page size.
         db (Session): SQLAlchemy database session used for querying.
 
     Returns:
-        List[Product]: A list of all products in the database.
+        List[Product]: A page of products. When more exist, the `X-Next-Cursor`
+        response header holds the token for the next page. `image_srcsets` holds
+        a WebP and a JPEG srcset per image, once its resized copies exist.
+        Responses carry an ETag; a matching If-None-Match is answered with 304 Not Modified.
     """
-    return db.query_eng(Product).all()
+
+    def render():
+        products, next_cursor = paginate(
+            db.query_eng(Product), Product.created_at, Product.id, cursor, limit
+        )
+        columns = Product.__table__.columns
+        data = []
+        for product in products:
+            item = {column.name: getattr(product, column.name) for column in columns}
+            item["image_srcsets"] = image_srcsets(product.images, product.image_variants)
+            data.append(item)
+        return data, {"X-Next-Cursor": next_cursor} if next_cursor else {}
+
+    return catalog_response(request, db, "products", (cursor, limit), render)
 
 
 @router.get("/get_product/{id}")
@@ -161,7 +217,19 @@ def get_product(
     id: str,
     db: Session = Depends(load),
 ):
-    return db.query_eng(Product).filter(Product.id == id).first()
+    version, _ = catalog_version(db)
+    key = ("product", version, id)
+    product = catalog_cache.get(key)
+    if product is None:
+        product = db.query_eng(Product).filter(Product.id == id).first()
+        if product is None:
+            return None
+        product = {
+            **jsonable_encoder(product),
+            "image_srcsets": image_srcsets(product.images, product.image_variants),
+        }
+        catalog_cache.set(key, product)
+    return product
 
 
 @router.post("/add_fabric", status_code=status.HTTP_201_CREATED)
@@ -188,37 +256,46 @@ def add_fabric(
 
     Raises:
         HTTPException: If an error occurs while processing any of the images, a 400 error is raised with details.
+        The images are uploaded concurrently; objects already written are kept and reused on retry,
+        see upload_base64_images.
 
     Returns:
         Fabric:
     """
-    image_urls = []
-
-    for index, image_base64 in enumerate(request.images):
-        try:
-            header, image_data = image_base64.split(";base64,")
-            file_extension = header.split("/")[1]
-            image_data = base64.b64decode(image_data)
-            clean_name = request.name.replace(" ", "_")
-            clean_category = request.category.replace(" ", "_")
-            unique_filename = f"{clean_name + clean_category + str(uuid.uuid4())[:6]}.{file_extension}"
-
-            s3_client.put_object(
-                Bucket=settings.S3_BUCKET_NAME,
-                Key=unique_filename,
-                Body=image_data,
-                ContentType=f"image/{file_extension}",
-            )
+    image_urls = upload_base64_images(request.images)
+    return save_fabric(request, image_urls, db)
 
-            # Construct the file URL
-            file_url = f"https://{settings.S3_BUCKET_NAME}.s3.{settings.S3_REGION}.amazonaws.com/{unique_filename}"
-            image_urls.append(file_url)
 
-        except Exception as e:
-            raise HTTPException(
-                status_code=400, detail=f"Failed to process image {index+1}: {str(e)}"
-            )
+@router.post("/add_fabric_form", status_code=status.HTTP_201_CREATED)
+def add_fabric_form(
+    data: str = Form(...),
+    images: List[UploadFile] = File(default=[]),
+    db: Session = Depends(load),
+    user: User = Depends(auth.check_authorization("admin")),
+):
+    """
+    Multipart/form-data variant of add_fabric.
+
+    Args:
+        data (str): The fabric as JSON, see FabricFields (name, category, prices).
+        images (List[UploadFile]): The images as binary file parts, in display order.
+        db (Session): SQLAlchemy database session used for querying and committing changes.
+        user (User): The authenticated user making the request, which must have 'admin' privileges.
+
+    Raises:
+        HTTPException: 400 if a part is not an allowed image or an upload fails. The images are
+        streamed to S3 concurrently; objects already written are kept and reused on retry,
+        see stream_form_images.
+
+    Returns:
+        Fabric:
+    """
+    request = parse_form_json(FabricFields, data)
+    image_urls = stream_form_images(images)
+    return save_fabric(request, image_urls, db)
+
 
+def save_fabric(request, image_urls, db) -> Fabric:
     new_fabric = Fabric(name=request.name, category=request.category, images=image_urls)
     db.add(new_fabric)
 
@@ -230,40 +307,130 @@ def add_fabric(
         )
         db.add(fabric_price)
 
+    bump_catalog_version(db)
+    derive_variants(db, new_fabric, image_urls)
     return new_fabric
 
 
-@router.get(
-    "/fabrics", response_model=List[FabricSchema], status_code=status.HTTP_200_OK
-)
-def get_fabrics(db: Session = Depends(load)):
-    fabrics = (
-        db.query_eng(Fabric)
-        .options(joinedload(Fabric.prices).joinedload(FabricPrice.product_category))
-        .all()
-    )
-    print(fabrics)
-    if not fabrics:
-        raise HTTPException(status_code=404, detail="No fabrics found")
-
-    fabric_list = []
-    for fabric in fabrics:
-        prices = [
-            FabricPriceData(
-                product_category=price.product_category_id, price=price.price
+@router.get("/fabrics", status_code=status.HTTP_200_OK)
+def get_fabrics(
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(settings.PAGE_SIZE_DEFAULT, ge=1, le=settings.PAGE_SIZE_MAX),
+    db: Session = Depends(load_replica),
+):
+    """
+    Retrieves one page of fabrics, oldest first.
+
+    Args:
+        cursor (str, optional): The `X-Next-Cursor` header of the previous page.
+        limit (int): The page size.
+        db (Session): SQLAlchemy database session used for querying.
+
+    Returns:
+        List[dict]: A page of fabrics, each with the FabricSchema fields (name, category,
+        prices, images) plus `image_srcsets`, a WebP and a JPEG srcset per image once
+        its resized copies exist. When more exist, the `X-Next-Cursor` response header
+        holds the token for the next page. Responses carry an ETag; a matching
+        If-None-Match is answered with 304 Not Modified.
+
+    Raises:
+        HTTPException: 404 if there are no fabrics at all.
+    """
+    def render():
+        fabrics, next_cursor = paginate(
+            db.query_eng(Fabric).options(
+                joinedload(Fabric.prices).joinedload(FabricPrice.product_category)
+            ),
+            Fabric.created_at,
+            Fabric.id,
+            cursor,
+            limit,
+        )
+        if not fabrics and cursor is None:
+            raise HTTPException(status_code=404, detail="No fabrics found")
+
+        fabric_list = []
+        for fabric in fabrics:
+            prices = [
+                FabricPriceData(
+                    product_category=price.product_category_id, price=price.price
+                )
+                for price in fabric.prices
+            ]
+
+            fabric_data = FabricSchema(
+                name=fabric.name,
+                category=fabric.category,
+                prices=prices,
+                images=fabric.images,
+            )
+            fabric_list.append(
+                {
+                    **fabric_data.model_dump(),
+                    "image_srcsets": image_srcsets(fabric.images, fabric.image_variants),
+                }
             )
-            for price in fabric.prices
-        ]
-
-        fabric_data = FabricSchema(
-            name=fabric.name,
-            category=fabric.category,
-            prices=prices,
-            images=fabric.images,
+
+        return fabric_list, {"X-Next-Cursor": next_cursor} if next_cursor else {}
+
+    return catalog_response(request, db, "fabrics", (cursor, limit), render)
+
+
+@router.post("/bulk_import", status_code=status.HTTP_200_OK)
+def bulk_import(
+    file: UploadFile = File(...),
+    db: Session = Depends(load),
+    user: User = Depends(auth.check_authorization("admin")),
+):
+    """
+    Imports products, fabrics and fabric prices from a CSV or JSONL file.
+
+    Every row has a `type` column (`product`, `fabric` or `fabric_price`) plus the
+    fields of that kind. The file is streamed: rows are validated one at a time and
+    loaded with COPY into staging tables, then merged in a single transaction.
+    Rows with an `id` that already exists update the existing record.
+
+    Args:
+        file (UploadFile): a `.csv` or `.jsonl` file.
+        db (Session): SQLAlchemy database session, its engine provides the connection.
+        user (User): The authenticated user making the request, which must have 'admin' privileges.
+
+    Returns:
+        dict: imported row counts per table, plus the line and reason for every rejected row.
+    """
+    fmt = "jsonl" if file.filename.lower().endswith((".jsonl", ".ndjson")) else "csv"
+    try:
+        summary = import_catalog(db.engine, file.file, fmt)
+        invalidate_catalog()
+        return summary
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="The file must be UTF-8 encoded.",
         )
-        fabric_list.append(fabric_data)
 
-    return fabric_list
+
+@router.post("/backfill_image_variants", status_code=status.HTTP_202_ACCEPTED)
+def backfill_image_variants(
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(load),
+    user: User = Depends(auth.check_authorization("admin")),
+):
+    """
+    Queues resized copies of the product, fabric and measurement images that have none,
+    e.g. uploaded before they were made automatically. Call again until nothing is queued.
+    """
+    queued = {}
+    for model in (Product, Fabric, Measurement):
+        queued[model.__tablename__] = backfill_variants(db, model, limit)
+    return {"queued": queued, **image_variant_pool.stats()}
+
+
+@router.get("/cache_stats", status_code=status.HTTP_200_OK)
+def cache_stats(user: User = Depends(auth.check_authorization("admin"))):
+    """Hit, miss and eviction counters of this worker's catalog cache."""
+    return catalog_cache.stats()
 
 
 @router.post("/upload_image", status_code=status.HTTP_201_CREATED)
@@ -272,18 +439,17 @@ async def upload_image(
     file_name: str = Form(...),
     user: User = Depends(auth.check_authorization("admin")),
 ):
+    """
+    Uploads one image to S3 and returns its URL.
+
+    The file is streamed to S3 as a multipart upload, with parts sent concurrently
+    off the event loop, see stream_upload. A failed upload is aborted.
+    """
     try:
         file_extension = file.filename.split(".")[-1]
         unique_filename = f"{file_name}_{str(uuid.uuid4())[:6]}.{file_extension}"
 
-        s3_client.put_object(
-            Bucket=settings.S3_BUCKET_NAME,
-            Key=unique_filename,
-            Body=file.file,
-            ContentType=file.content_type,
-        )
-
-        file_url = f"https://{settings.S3_BUCKET_NAME}.s3.{settings.S3_REGION}.amazonaws.com/{unique_filename}"
+        file_url = await stream_upload(file, unique_filename, file.content_type)
 
         return {"url": file_url}
 
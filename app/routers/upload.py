@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.engine.load import load
+from app.models.fabric import Fabric
+from app.models.measurements import Measurement
+from app.models.product import Product
+from app.models.user import User
+from app.schema.upload import ConfirmUpload, UploadSession, UploadSessionRequest
+from app.utils import auth
+from app.utils.catalog import bump_catalog_version
+from app.utils.image_variants import derive_variants
+from app.utils.upload_sessions import (
+    confirm_uploads,
+    create_upload_session,
+    read_upload_session,
+)
+
+
+router = APIRouter(prefix="/upload", tags=["Uploads"])
+
+# catalog images are managed by admins, measurement images by their customer
+ADMIN_TARGETS = {"product": Product, "fabric": Fabric}
+
+
+def check_target_access(target: str, user: User):
+    if target in ADMIN_TARGETS and user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="401 UNAUTHORIZED",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@router.post("/session", status_code=status.HTTP_201_CREATED)
+def create_session(
+    request: UploadSessionRequest,
+    user: User = Depends(auth.get_current_user),
+) -> UploadSession:
+    """
+    Starts a direct-to-S3 image upload.
+
+    Parameters:
+    - request (UploadSessionRequest): What the images are for, and the content type and size of each.
+    - user (User): The current user; product and fabric images require an admin.
+
+    Returns:
+    - UploadSession: One presigned POST per image, and the `session` to pass to /upload/confirm
+      once the images are uploaded. Each POST only accepts its declared content type and at most
+      its declared size, and expires after `expires_in` seconds.
+
+    The image bytes go from the client straight to S3 and never pass through the API.
+    """
+    check_target_access(request.target, user)
+    return create_upload_session(request.target, user.id, request.files)
+
+
+@router.post("/confirm", status_code=status.HTTP_200_OK)
+def confirm_session(
+    request: ConfirmUpload,
+    db: Session = Depends(load),
+    user: User = Depends(auth.get_current_user),
+):
+    """
+    Attaches the images of an upload session to their record.
+
+    Parameters:
+    - request (ConfirmUpload): The session from /upload/session, and the product or fabric id.
+    - db (Session): A database session object.
+    - user (User): The user the session was issued to.
+
+    Returns:
+    - The updated product, fabric or measurement record.
+
+    Raises:
+    - HTTPException: 400 if the session is invalid or an image is missing or does not match
+      what was declared, 404 if the record does not exist.
+
+    Confirming the same session twice does not attach its images twice.
+    """
+    session = read_upload_session(request.session, user.id)
+    target = session["target"]
+    check_target_access(target, user)
+
+    if target == "measurement":
+        record = (
+            db.query_eng(Measurement).filter(Measurement.customer_id == user.id).first()
+        )
+    else:
+        model = ADMIN_TARGETS[target]
+        record = db.query_eng(model).filter(model.id == request.target_id).first()
+    if record is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=[{"msg": f"{target} not found"}],
+        )
+
+    image_urls = list(record.images or [])
+    new_urls = [url for url in confirm_uploads(session) if url not in image_urls]
+    record.images = image_urls + new_urls
+    derive_variants(db, record, new_urls)
+    db.add(record)
+    if target in ADMIN_TARGETS:
+        bump_catalog_version(db)
+    return record
@@ -9,3 +9,17 @@ class Token(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class Principal(BaseModel):
+    """The authenticated user, resolved from a verified access token."""
+
+    id: str
+    email: str
+    phone: str
+    role: str
+    is_verified: bool | None
+
+    class Config:
+        from_attributes = True
+        frozen = True
@@ -88,7 +88,9 @@ class UpdateCustomer(BaseModel):
         from_attributes = True
 
 
-class MeasurementSchema(BaseModel):
+class MeasurementFields(BaseModel):
+    """the measurements without their images, as sent next to image parts"""
+
     neck: float | None
     shoulder: float | None
     arm_hole: float | None
@@ -103,12 +105,15 @@ class MeasurementSchema(BaseModel):
     knee: float | None
     ankle: float | None
     pant_length: float | None
-    images: List[str] | None
 
     class Config:
         from_attributes = True
 
 
+class MeasurementSchema(MeasurementFields):
+    images: List[str] | None
+
+
 class CreateCart(BaseModel):
     quantity: int
     product_id: str
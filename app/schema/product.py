@@ -1,18 +1,28 @@
-from pydantic import BaseModel
+import json
+import uuid
+
+from pydantic import BaseModel, Field, field_validator
 from typing import List
 
+from app.models.product import DEFAULT_STOCK_IMAGE_URL
+
+
+class ProductFields(BaseModel):
+    """the product without its images, as sent next to image parts"""
 
-class ProductSchema(BaseModel):
     name: str
     price: float
     description: str
     category_id: str
-    images: List[str]
 
     class Config:
         from_attributes = True
 
 
+class ProductSchema(ProductFields):
+    images: List[str]
+
+
 class FabricPriceData(BaseModel):
     product_category: str
     price: float
@@ -21,15 +31,64 @@ class FabricPriceData(BaseModel):
         from_attributes = True
 
 
-class FabricSchema(BaseModel):
+class FabricFields(BaseModel):
+    """the fabric without its images, as sent next to image parts"""
+
     name: str
     category: str
     prices: List[FabricPriceData]
-    images: List[str]
 
     class Config:
         from_attributes = True
 
 
+class FabricSchema(FabricFields):
+    images: List[str]
+
+
 class ProductCategorySchema(BaseModel):
     name: str
+
+
+def split_image_urls(value):
+    """CSV cells carry image URLs as a JSON list or separated by '|'."""
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith("["):
+            return json.loads(value)
+        return [url.strip() for url in value.split("|") if url.strip()]
+    return value
+
+
+# required text columns reject "", so a blank value is a row error and not a
+# NOT NULL or foreign key failure that rolls back the whole import
+class FabricImportRow(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), min_length=1)
+    name: str = Field(min_length=1)
+    category: str | None = None
+    images: List[str] = []
+
+    _split_images = field_validator("images", mode="before")(split_image_urls)
+
+
+class ProductImportRow(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), min_length=1)
+    name: str = Field(min_length=1)
+    price: float
+    description: str | None = None
+    category_id: str = Field(min_length=1)
+    images: List[str] = Field(default_factory=list, validate_default=True)
+
+    _split_images = field_validator("images", mode="before")(split_image_urls)
+
+    @field_validator("images")
+    @classmethod
+    def default_image(cls, value):
+        return value or [DEFAULT_STOCK_IMAGE_URL]
+
+
+class FabricPriceImportRow(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()), min_length=1)
+    fabric_id: str = Field(min_length=1)
+    product_category_id: str = Field(min_length=1)
+    price: float
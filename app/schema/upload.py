@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from app.config.config import settings
+
+
+class UploadFileSpec(BaseModel):
+    content_type: str
+    size: int = Field(gt=0)
+
+    @field_validator("content_type")
+    def allowed_content_type(cls, value):
+        if value not in settings.UPLOAD_ALLOWED_CONTENT_TYPES:
+            raise ValueError(
+                f"content type must be one of {', '.join(settings.UPLOAD_ALLOWED_CONTENT_TYPES)}"
+            )
+        return value
+
+    @field_validator("size")
+    def allowed_size(cls, value):
+        if value > settings.UPLOAD_MAX_BYTES:
+            raise ValueError(f"images may be at most {settings.UPLOAD_MAX_BYTES} bytes")
+        return value
+
+
+class UploadSessionRequest(BaseModel):
+    target: Literal["product", "fabric", "measurement"]
+    files: List[UploadFileSpec] = Field(min_length=1)
+
+    @field_validator("files")
+    def allowed_count(cls, value):
+        if len(value) > settings.UPLOAD_MAX_FILES:
+            raise ValueError(f"at most {settings.UPLOAD_MAX_FILES} images per upload")
+        return value
+
+
+class PresignedUpload(BaseModel):
+    key: str
+    url: str
+    fields: dict
+
+
+class UploadSession(BaseModel):
+    session: str
+    uploads: List[PresignedUpload]
+    expires_in: int
+
+
+class ConfirmUpload(BaseModel):
+    session: str
+    # the product or fabric id; measurements belong to the current user
+    target_id: Optional[str] = None
@@ -1,19 +1,25 @@
 #!/usr/bin/env python3
+import hashlib
+import time
 from typing import List
 from datetime import datetime, timedelta, timezone
 
 from fastapi import Depends, HTTPException, Request, Response, status
+from fastapi.security.utils import get_authorization_scheme_param
 from itsdangerous import URLSafeTimedSerializer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import EmailStr
 from starlette import status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config.config import settings
-from app.engine.load import load
+from app.engine.load import load, load_async
 from app.models.user import User
-from app.utils.emails import Email
+from app.schema.auth import Principal
+from app.utils.cache import TTLCache
+from app.utils.outbox import outbox_worker, queue_email
+from app.utils.password_pool import PasswordPool, pwd_context
 from .cookies import OAuth2PasswordBearerWithCookie
 
 
@@ -21,9 +27,23 @@ from .cookies import OAuth2PasswordBearerWithCookie
 verification_serializer = URLSafeTimedSerializer(
     settings.JWT_SECRET_KEY, salt="verification"
 )
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearerWithCookie(tokenUrl="/auth/token")
 
+# bcrypt off the event loop and the shared threadpool, see PasswordPool
+password_pool = PasswordPool(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS,
+)
+
+# verified principals keyed by token digest, see resolve_principal
+principal_cache = TTLCache(
+    ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS,
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+)
+# user id -> time of the user's last profile or role change
+_invalidated_at = {}
+
 
 def get_password_hash(password: str) -> str:
     """
@@ -40,12 +60,28 @@ def get_password_hash(password: str) -> str:
 
     Note:
     This function uses the CryptContext class from the passlib library to hash the password.
-    The hashed password is returned as a string.
+    It blocks for the whole bcrypt run; request handlers should use hash_password instead.
     """
     hash: str = pwd_context.hash(password)
     return hash
 
 
+async def hash_password(password: str) -> str:
+    """
+    Hash a password on the bcrypt worker pool.
+
+    Parameters:
+    password (str): The plain text password to be hashed.
+
+    Returns:
+    str: The hashed password.
+
+    Raises:
+    HTTPException: 503 if the worker pool is saturated or the job timed out.
+    """
+    return await password_pool.hash(password)
+
+
 def generate_token(email: List[EmailStr]) -> str:
     """
     Generates a unique token for email verification.
@@ -66,23 +102,31 @@ def generate_token(email: List[EmailStr]) -> str:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-async def send_verification_mail(email, http_request, request):
-    try:
-        token = generate_token(email)
-
-        # save generated token with email in a cache
-        # json_cache.set(token, email)
-
-        verification_url = f"https://api.joshsamuels.co/auth/verify_email/{token}"
-        # token_url =  f"{http_request.url.scheme}://{http_request.client.host}:{http_request.url.port}/auth/verifyemail/{token}"
-        await Email(request.first_name, verification_url, [email]).send_mail(
-            "Your Verification Link", "verification"
-        )
+async def send_verification_mail(email, http_request, request, db):
+    """
+    Queues the verification email in the outbox of the caller's transaction.
 
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=[{"msg": f"{e}"}]
+    The mail is delivered by the outbox worker once the transaction commits,
+    so the request never waits on the mail server, and a registration that
+    rolls back sends nothing.
+    """
+    token = generate_token(email)
+
+    # save generated token with email in a cache
+    # json_cache.set(token, email)
+
+    verification_url = f"https://api.joshsamuels.co/auth/verify_email/{token}"
+    # token_url =  f"{http_request.url.scheme}://{http_request.client.host}:{http_request.url.port}/auth/verifyemail/{token}"
+    await db.add(
+        queue_email(
+            email,
+            "Your Verification Link",
+            "verification",
+            name=request.first_name,
+            token_url=verification_url,
         )
+    )
+    db.after_commit(outbox_worker.wake)
 
     return "Verification email sent successfully"
 
@@ -132,11 +176,29 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     Note:
     This function uses the CryptContext class from the passlib library to verify the password.
     The pwd_context object is assumed to be globally defined and initialized with the bcrypt scheme.
+    It blocks for the whole bcrypt run; request handlers should use check_password instead.
     """
     verified: bool = pwd_context.verify(plain_password, hashed_password)
     return verified
 
 
+async def check_password(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password against its hash on the bcrypt worker pool.
+
+    Parameters:
+    plain_password (str): The plain text password to be verified.
+    hashed_password (str): The hashed password to be compared with the plain text password.
+
+    Returns:
+    bool: True if the plain text password matches the hashed password, False otherwise.
+
+    Raises:
+    HTTPException: 503 if the worker pool is saturated or the job timed out.
+    """
+    return await password_pool.verify(plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     """
     Generate an access token for a user using JWT.
@@ -165,6 +227,81 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     return encoded_jwt
 
 
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def invalidate_principal(user_id: str):
+    """
+    Forget every cached principal of a user in this process.
+
+    Parameters:
+    user_id (str): The id of the user whose profile or role changed.
+
+    Note:
+    Call it once the change has been committed. Other worker processes pick the
+    change up when their entries expire, after at most PRINCIPAL_CACHE_TTL_SECONDS.
+    """
+    now = time.monotonic()
+    _invalidated_at[user_id] = now
+    # marks older than the cache TTL can no longer match a live entry
+    for stale_id, marked_at in list(_invalidated_at.items()):
+        if now - marked_at > settings.PRINCIPAL_CACHE_TTL_SECONDS:
+            _invalidated_at.pop(stale_id, None)
+
+
+def resolve_principal(
+    token: str | None, db: Session, credentials_exception: HTTPException
+) -> Principal:
+    """
+    Resolve an access token to the principal it was issued for.
+
+    Parameters:
+    token (str | None): The raw JWT access token.
+    db (Session): The database session used on a cache miss.
+    credentials_exception (HTTPException): Raised when the token or user is not valid.
+
+    Returns:
+    Principal: A read-only snapshot of the user (no password hash).
+
+    Note:
+    Verified principals are cached by a digest of the token, so repeated requests
+    with the same token skip both the JWT verification and the users lookup.
+    An entry never outlives the token's `exp` claim, and invalidate_principal
+    drops a user's entries after a profile or role change.
+    """
+    if not token:
+        raise credentials_exception
+
+    digest = _token_digest(token)
+    cached = principal_cache.get(digest)
+    if cached is not None:
+        principal, cached_at = cached
+        if _invalidated_at.get(principal.id, float("-inf")) < cached_at:
+            return principal
+
+    # taken before the lookup, so an invalidation that races with it still wins
+    cached_at = time.monotonic()
+    try:
+        payload = jwt.decode(
+            token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
+        )
+        email: str = payload.get("sub")
+        if email is None:
+            raise credentials_exception
+    except JWTError:
+        raise credentials_exception
+    user = db.query_eng(User).filter(User.email_matches(email)).first()
+    if user is None:
+        raise credentials_exception
+
+    principal = Principal.model_validate(user)
+    expires_at = payload.get("exp")
+    ttl = expires_at - time.time() if expires_at else None
+    principal_cache.set(digest, (principal, cached_at), ttl=ttl)
+    return principal
+
+
 def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(load)):
     """
     Retrieve the current user based on the provided access token.
@@ -176,35 +313,21 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     If not provided, the function will use the session object provided by the load function.
 
     Returns:
-    User: The User object representing the current user.
+    Principal: The principal representing the current user.
 
     Raises:
     HTTPException: If the access token is not valid or the user does not exist in the database.
 
     Note:
-    This function decodes the access token using the JWT library, retrieves the username from the payload,
-    and queries the database to find the corresponding user.
-    If the access token is not valid or the user does not exist,
-    an HTTPException is raised with appropriate error details.
+    The token is resolved by resolve_principal, which only decodes the token and
+    queries the database when the principal is not cached yet.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(
-            token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
-        )
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = db.query_eng(User).filter(User.email == username).first()
-    if user is None:
-        raise credentials_exception
-    return user
+    return resolve_principal(token, db, credentials_exception)
 
 
 def check_authorization(required_role: str):
@@ -222,43 +345,32 @@ def check_authorization(required_role: str):
         If not provided, the function will use the session object provided by the load function.
 
         Returns:
-        User: The User object representing the current user.
+        Principal: The principal representing the current user.
 
         Raises:
-        HTTPException: If the access token is not valid or the user does not exist in the database.
+        HTTPException: If the access token is not valid, the user does not exist in the database
+        or their role does not match.
 
         Note:
-        This function decodes the access token using the JWT library, retrieves the username from the payload,
-        and queries the database to find the corresponding user.
-        If the access token is not valid or the user does not exist,
-        an HTTPException is raised with appropriate error details.
+        The role is checked against the user's stored role rather than the token claim, so
+        a role change takes effect as soon as the user's cached principal is invalidated.
         """
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="401 UNAUTHORIZED",
             headers={"WWW-Authenticate": "Bearer"},
         )
-        try:
-            payload = jwt.decode(
-                token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
-            )
-            role = payload.get("role")
-            email = payload.get("sub")
-            if role != required_role:
-                print(f"{role} != {required_role}")
-                raise credentials_exception
-        except JWTError:
-            raise credentials_exception
-        user = db.query_eng(User).filter(User.email == email).first()
-        if user is None:
+        user = resolve_principal(token, db, credentials_exception)
+        if user.role != required_role:
+            print(f"{user.role} != {required_role}")
             raise credentials_exception
         return user
 
     return get_current_role
 
 
-def authenticate_user(
-    username: str, password: str, db: Session = Depends(load)
+async def authenticate_user(
+    username: str, password: str, db: AsyncSession = Depends(load_async)
 ) -> User | bool:
     """
     Authenticate a user based on their username and password.
@@ -266,21 +378,31 @@ def authenticate_user(
     Parameters:
     username (str): The username of the user to be authenticated.
     password (str): The password of the user to be authenticated.
-    db (Session, optional): The database session object to be used for querying the user. If not provided, the function will use the session object provided by the load function.
+    db (AsyncSession, optional): The database session object to be used for querying the user. If not provided, the function will use the session object provided by the load_async function.
 
     Returns:
     Union[User, bool]: If the user is authenticated and exists in the database, the User object is returned. If the user does not exist or the password is incorrect, False is returned.
 
     Note:
     This function queries the database to find the user with the provided username.
-    It then verifies the password using the verify_password function.
+    It then verifies the password on the bcrypt worker pool using the check_password function.
     If the user is authenticated, the User object is returned. Otherwise, False is returned.
+    A hash made with a lower cost than the current one is replaced with a fresh hash of the
+    password, which is only available at this point. Unverified users are skipped: login
+    rejects them, which would roll the new hash back.
     """
-    user = db.query_eng(User).filter(User.email == username).first()
+    user = await db.query_eng(User).filter(User.email_matches(username)).first()
     if not user:
         return False
-    if not verify_password(password, user.password_hash):
+    if not await check_password(password, user.password_hash):
         return False
+    if user.is_verified and pwd_context.needs_update(user.password_hash):
+        try:
+            user.password_hash = await hash_password(password)
+            await db.update(user)
+        except HTTPException:
+            # the pool is saturated; keep the old hash and retry next login
+            pass
     return user
 
 
@@ -344,7 +466,9 @@ def delete_access_cookies(response: Response):
     )
 
 
-def get_current_user_from_cookie(request: Request, db: Session = Depends(load)) -> User:
+def get_current_user_from_cookie(
+    request: Request, db: Session = Depends(load)
+) -> Principal:
     """
     Retrieve the current user based on the access token stored in the request cookies.
 
@@ -353,32 +477,19 @@ def get_current_user_from_cookie(request: Request, db: Session = Depends(load))
     db (Session, optional): The database session object to be used for querying the user. If not provided, the function will use the session object provided by the load function.
 
     Returns:
-    User: The User object representing the current user.
+    Principal: The principal representing the current user.
 
     Raises:
     HTTPException: If the access token is not valid or the user does not exist in the database.
 
     Note:
-    This function retrieves the access token from the request cookies.
-    It then decodes the token using the JWT library, retrieves the username from the payload, and queries the database to find the corresponding user.
-    If the access token is not valid or the user does not exist, an HTTPException is raised with appropriate error details.
+    This function retrieves the access token from the request cookies and resolves it with
+    resolve_principal, like get_current_user.
     """
-    token = request.cookies.get("access_token")
+    _, token = get_authorization_scheme_param(request.cookies.get("access_token"))
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(
-            token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM]
-        )
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = db.query_eng(User).filter(User.email == username).first()
-    if user is None:
-        raise credentials_exception
-    return user
+    return resolve_principal(token, db, credentials_exception)
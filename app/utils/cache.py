@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""bounded in-process cache with per-entry TTL and LRU eviction"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def approximate_size(value) -> int:
+    """Size of a JSON-serializable value, as the length of its JSON text."""
+    return len(json.dumps(value, default=str))
+
+
+class TTLCache:
+    """
+    A thread-safe LRU cache whose entries also expire `ttl` seconds after
+    they are stored. It is bounded by entry count and, when max_bytes is
+    set, by the approximate size of the stored values, evicting least
+    recently used entries first.
+
+    Attributes:
+        hits, misses, evictions, expirations (int): lifetime counters.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int | None = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (expires_at, size, value)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key, default=None):
+        """Returns the cached value, or default if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[0] <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def set(self, key, value, size: int | None = None, ttl: float | None = None):
+        """
+        Stores a value, evicting the least recently used entries to make room.
+        Values larger than the whole cache are not stored. `ttl` shortens the
+        lifetime of this entry below the cache default.
+        """
+        if self.max_bytes is None:
+            size = 0
+        elif size is None:
+            size = approximate_size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self._bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def pop(self, key):
+        """Removes one entry if present."""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        """Drops every entry, counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Read cache and HTTP validators for the product/fabric catalog.
+
+Catalog reads vastly outnumber writes, so rendered catalog responses are
+kept in a per-process TTLCache, keyed by the catalog version. The version
+is a single-row counter that every catalog write bumps in its own
+transaction; each worker re-reads it at most every
+CATALOG_VERSION_CHECK_SECONDS, so a write on one worker is picked up by
+the others within that delay. The version also drives the ETag and
+Last-Modified headers, which lets unchanged catalog polls be answered
+with 304 Not Modified straight from memory.
+
+List responses are rendered once per catalog version to orjson bytes,
+with gzip and brotli variants stored alongside, so a request only has to
+pick the variant its Accept-Encoding allows.
+"""
+
+import gzip
+import hashlib
+import threading
+import time
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+import brotli
+import orjson
+from fastapi import Request, Response, status
+from sqlalchemy import func
+
+from app.config.config import settings
+from app.models.catalog_version import CatalogVersion
+from app.utils.cache import TTLCache
+
+
+catalog_cache = TTLCache(
+    ttl=settings.CATALOG_CACHE_TTL_SECONDS,
+    max_entries=settings.CATALOG_CACHE_MAX_ENTRIES,
+    max_bytes=settings.CATALOG_CACHE_MAX_BYTES,
+)
+
+_version = {"value": 0, "modified": None, "checked_at": None}
+_version_lock = threading.Lock()
+
+
+def invalidate_catalog():
+    """Drops every cached catalog response in this process and re-reads the version."""
+    catalog_cache.clear()
+    _version["checked_at"] = None
+
+
+def bump_catalog_version(db):
+    """
+    Increments the catalog version inside the caller's transaction and
+    invalidates this process' cache once that transaction commits.
+    """
+    db.query_eng(CatalogVersion).filter(CatalogVersion.id == 1).update(
+        {
+            CatalogVersion.version: CatalogVersion.version + 1,
+            CatalogVersion.updated_at: func.timezone("utc", func.now()),
+        },
+        synchronize_session=False,
+    )
+    db.after_commit(invalidate_catalog)
+
+
+def _version_is_fresh():
+    checked_at = _version["checked_at"]
+    return checked_at is not None and (
+        time.monotonic() - checked_at < settings.CATALOG_VERSION_CHECK_SECONDS
+    )
+
+
+def catalog_version(db) -> tuple:
+    """
+    Returns (version, last_modified) of the catalog. Only queries the
+    database when the in-process copy is older than the check interval.
+    """
+    if not _version_is_fresh():
+        with _version_lock:
+            if not _version_is_fresh():
+                row = db.query_eng(CatalogVersion).filter(CatalogVersion.id == 1).first()
+                if row is not None:
+                    _version.update(value=row.version, modified=row.updated_at)
+                _version["checked_at"] = time.monotonic()
+    return _version["value"], _version["modified"]
+
+
+def catalog_etag(version, *parts) -> str:
+    """Strong ETag for one representation (endpoint + query + coding) of a catalog version."""
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=6).hexdigest()
+    return f'"c{version}-{digest}"'
+
+
+def preferred_encoding(accept_encoding: str) -> str:
+    """Picks br, then gzip, then identity from an Accept-Encoding header."""
+    accepted = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                pass
+        accepted[coding.strip()] = quality
+    for coding in ("br", "gzip"):
+        if accepted.get(coding, accepted.get("*", 0)) > 0:
+            return coding
+    return "identity"
+
+
+class RenderedPayload:
+    """
+    A catalog response body serialized once with orjson, stored next to
+    its gzip and brotli encodings so requests only pick a variant.
+    """
+
+    __slots__ = ("variants", "headers")
+
+    def __init__(self, data, headers=None):
+        body = orjson.dumps(data)
+        self.variants = {
+            "identity": body,
+            "gzip": gzip.compress(body, compresslevel=9),
+            "br": brotli.compress(body, quality=11),
+        }
+        self.headers = headers or {}
+
+    @property
+    def size(self) -> int:
+        return sum(len(variant) for variant in self.variants.values())
+
+
+def _validator_headers(etag, modified) -> dict:
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(
+            modified.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True
+        )
+    return headers
+
+
+def _is_not_modified(request: Request, etag: str, modified) -> bool:
+    """True when If-None-Match (or, failing that, If-Modified-Since) matches."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return etag in tags or "*" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and modified is not None:
+        try:
+            modified = modified.replace(tzinfo=timezone.utc, microsecond=0)
+            return modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def catalog_response(request: Request, db, name: str, params: tuple, render):
+    """
+    Serves one catalog representation.
+
+    Unchanged representations are answered with 304 before anything is
+    loaded. Otherwise the pre-rendered payload for the current catalog
+    version is taken from the cache, or built once with `render`, and the
+    variant matching the request's Accept-Encoding is sent as is.
+
+    Args:
+        request (Request): the incoming request.
+        db: storage used to read the catalog version and, on a miss, the data.
+        name (str): endpoint name, part of the cache key and ETag.
+        params (tuple): query parameters that select the representation.
+        render (callable): returns (data, extra_headers) for the response body.
+
+    Returns:
+        Response: a 304 or a 200 with a pre-encoded JSON body.
+    """
+    version, modified = catalog_version(db)
+    encoding = preferred_encoding(request.headers.get("accept-encoding", ""))
+    etag = catalog_etag(version, name, *params, encoding)
+    headers = _validator_headers(etag, modified)
+    if _is_not_modified(request, etag, modified):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    key = (name, version, *params)
+    payload = catalog_cache.get(key)
+    if payload is None:
+        payload = RenderedPayload(*render())
+        catalog_cache.set(key, payload, size=payload.size)
+
+    headers.update(payload.headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(
+        content=payload.variants[encoding],
+        media_type="application/json",
+        headers=headers,
+    )
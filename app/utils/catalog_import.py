@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Streaming bulk import of the product/fabric catalog.
+
+Rows are read one at a time from a CSV or JSONL upload, validated, and
+written in fixed-size batches to temporary staging tables with Postgres
+COPY. Once the whole file is staged, the staging tables are merged into
+fabrics, products and fabric_prices in the same transaction, so a file
+is imported completely or not at all, and memory use does not depend on
+the file size.
+
+Every row names its kind in a `type` column: `product`, `fabric` or
+`fabric_price`. Fabric prices may reference fabrics from the same file
+by their `id`.
+"""
+
+import csv
+import io
+import json
+
+from pydantic import ValidationError
+
+from app.schema.product import (
+    FabricImportRow,
+    FabricPriceImportRow,
+    ProductImportRow,
+)
+
+
+# rows buffered in memory before each COPY
+BATCH_ROWS = 5000
+# per-row errors returned in the response, the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+STAGING = {
+    "fabric": (
+        "staging_fabrics",
+        FabricImportRow,
+        ["line", "id", "name", "category", "images"],
+        "line int, id text, name text, category text, images jsonb",
+    ),
+    "product": (
+        "staging_products",
+        ProductImportRow,
+        ["line", "id", "name", "price", "description", "category_id", "images"],
+        "line int, id text, name text, price float8, description text,"
+        " category_id text, images jsonb",
+    ),
+    "fabric_price": (
+        "staging_fabric_prices",
+        FabricPriceImportRow,
+        ["line", "id", "fabric_id", "product_category_id", "price"],
+        "line int, id text, fabric_id text, product_category_id text, price float8",
+    ),
+}
+
+# rows whose references do not resolve, reported instead of failing the merge
+ORPHAN_CHECKS = [
+    (
+        "product",
+        """
+        DELETE FROM staging_products s
+        WHERE NOT EXISTS (SELECT 1 FROM product_categories c WHERE c.id = s.category_id)
+        RETURNING line, category_id
+        """,
+        "unknown product category '{}'",
+    ),
+    (
+        "fabric_price",
+        """
+        DELETE FROM staging_fabric_prices s
+        WHERE NOT EXISTS (SELECT 1 FROM product_categories c WHERE c.id = s.product_category_id)
+        RETURNING line, product_category_id
+        """,
+        "unknown product category '{}'",
+    ),
+    (
+        "fabric_price",
+        """
+        DELETE FROM staging_fabric_prices s
+        WHERE NOT EXISTS (SELECT 1 FROM fabrics f WHERE f.id = s.fabric_id)
+        AND NOT EXISTS (SELECT 1 FROM staging_fabrics f WHERE f.id = s.fabric_id)
+        RETURNING line, fabric_id
+        """,
+        "unknown fabric '{}'",
+    ),
+]
+
+# the last row wins when the same id appears more than once in a file
+MERGES = {
+    "fabrics": """
+        INSERT INTO fabrics (id, created_at, updated_at, name, category, images)
+        SELECT DISTINCT ON (id) id, LOCALTIMESTAMP, LOCALTIMESTAMP, name, category, images
+        FROM staging_fabrics ORDER BY id, line DESC
+        ON CONFLICT (id) DO UPDATE SET
+            name = EXCLUDED.name, category = EXCLUDED.category,
+            images = EXCLUDED.images, updated_at = EXCLUDED.updated_at
+        """,
+    "products": """
+        INSERT INTO products
+            (id, created_at, updated_at, name, price, description, category_id, images)
+        SELECT DISTINCT ON (id) id, LOCALTIMESTAMP, LOCALTIMESTAMP,
+            name, price, description, category_id, images
+        FROM staging_products ORDER BY id, line DESC
+        ON CONFLICT (id) DO UPDATE SET
+            name = EXCLUDED.name, price = EXCLUDED.price,
+            description = EXCLUDED.description, category_id = EXCLUDED.category_id,
+            images = EXCLUDED.images, updated_at = EXCLUDED.updated_at
+        """,
+    "fabric_prices": """
+        INSERT INTO fabric_prices
+            (id, created_at, updated_at, fabric_id, product_category_id, price)
+        SELECT DISTINCT ON (id) id, LOCALTIMESTAMP, LOCALTIMESTAMP,
+            fabric_id, product_category_id, price
+        FROM staging_fabric_prices ORDER BY id, line DESC
+        ON CONFLICT (id) DO UPDATE SET
+            fabric_id = EXCLUDED.fabric_id,
+            product_category_id = EXCLUDED.product_category_id,
+            price = EXCLUDED.price, updated_at = EXCLUDED.updated_at
+        """,
+}
+
+
+BUMP_CATALOG_VERSION = """
+    UPDATE catalog_version
+    SET version = version + 1, updated_at = timezone('utc', now())
+    WHERE id = 1
+"""
+
+
+def copy_value(value):
+    """
+    Desc:
+        formats one value for COPY's text format, where NULL is written as
+        \\N and an empty string stays an empty string (CSV would load "" as NULL)
+    """
+    if value is None:
+        return "\\N"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def read_rows(fileobj, fmt):
+    """
+    Desc:
+        lazily yields (line number, dict) pairs from a binary upload
+    Args:
+        fileobj: a binary file object
+        fmt (str): "csv" or "jsonl"
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    if fmt == "jsonl":
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, e
+    else:
+        reader = csv.DictReader(text)
+        for row in reader:
+            # blank CSV cells mean "not provided"
+            yield reader.line_num, {k: v for k, v in row.items() if v not in ("", None)}
+
+
+class CatalogImport:
+    """
+    Validates and stages rows over a raw DBAPI connection, then merges them.
+
+    Attributes:
+        errors (list): the first MAX_REPORTED_ERRORS row errors
+        error_count (int): total number of rejected rows
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.buffers = {kind: [] for kind in STAGING}
+        self.staged = {kind: 0 for kind in STAGING}
+        self.errors = []
+        self.error_count = 0
+
+    def reject(self, line, kind, msg):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "type": kind, "msg": msg})
+
+    def stage(self, line, data):
+        """Validates one row and buffers it for the next COPY of its kind."""
+        if isinstance(data, Exception):
+            return self.reject(line, None, f"Invalid JSON: {data}")
+        if not isinstance(data, dict):
+            return self.reject(line, None, "Row must be an object")
+
+        kind = data.pop("type", None)
+        if kind not in STAGING:
+            return self.reject(line, kind, f"Unknown row type '{kind}'")
+
+        _, schema, columns, _ = STAGING[kind]
+        try:
+            row = schema.model_validate(data)
+        except ValidationError as e:
+            msg = "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}"
+                for err in e.errors()
+            )
+            return self.reject(line, kind, msg)
+
+        values = row.model_dump()
+        values["line"] = line
+        if "images" in values:
+            values["images"] = json.dumps(values["images"])
+        buffer = self.buffers[kind]
+        buffer.append([values[column] for column in columns])
+        if len(buffer) >= BATCH_ROWS:
+            self.copy(kind)
+
+    def copy(self, kind):
+        """Sends the buffered rows of one kind to its staging table with COPY."""
+        rows = self.buffers[kind]
+        if not rows:
+            return
+        table, _, columns, _ = STAGING[kind]
+        data = io.StringIO()
+        for row in rows:
+            data.write("\t".join(copy_value(value) for value in row) + "\n")
+        data.seek(0)
+        self.cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT text)", data
+        )
+        self.staged[kind] += len(rows)
+        rows.clear()
+
+    def run(self, rows):
+        """
+        Desc:
+            stages every row, drops rows with dangling references and
+            merges the rest. Commits once at the end, rolls back on failure.
+        Return:
+            returns a summary dict with imported counts and row errors
+        """
+        try:
+            for table, _, _, definition in STAGING.values():
+                self.cursor.execute(
+                    f"CREATE TEMP TABLE {table} ({definition}) ON COMMIT DROP"
+                )
+
+            for line, data in rows:
+                self.stage(line, data)
+            for kind in STAGING:
+                self.copy(kind)
+
+            for kind, query, msg in ORPHAN_CHECKS:
+                self.cursor.execute(query)
+                for line, value in self.cursor.fetchall():
+                    self.reject(line, kind, msg.format(value))
+
+            imported = {}
+            for table, query in MERGES.items():
+                self.cursor.execute(query)
+                imported[table] = self.cursor.rowcount
+            self.cursor.execute(BUMP_CATALOG_VERSION)
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
+        finally:
+            self.cursor.close()
+
+        self.errors.sort(key=lambda error: error["line"])
+        return {
+            "imported": imported,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+def import_catalog(engine, fileobj, fmt="csv"):
+    """
+    Desc:
+        streams a CSV or JSONL catalog file into the database
+    Args:
+        engine: the SQLAlchemy engine to borrow a connection from
+        fileobj: a binary file object positioned at the start of the upload
+        fmt (str): "csv" or "jsonl"
+    Return:
+        returns a summary dict with imported counts and row errors
+    """
+    connection = engine.raw_connection()
+    try:
+        return CatalogImport(connection).run(read_rows(fileobj, fmt))
+    finally:
+        connection.close()
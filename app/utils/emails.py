@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
+import asyncio
+from email.message import EmailMessage
+import json
+import logging
+import time
 from typing import List
+
+import aiosmtplib
+import css_inline
 from app.config.config import settings
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
-from jinja2 import Environment, select_autoescape, PackageLoader
+from jinja2 import Environment, FileSystemBytecodeCache, select_autoescape, PackageLoader
+from markupsafe import Markup
 from pydantic import EmailStr
 
 
@@ -13,12 +21,201 @@ The Jinja2 environment is configured with the following settings:
 - The package name is 'app' and the template directory is 'templates'.
 - The autoescape setting is set to select_autoescape, which automatically escapes HTML in variables to avoid XSS.
 - The autoescape is set to escape HTML and XML.
+- Compiled templates are kept in a bytecode cache on disk, so worker processes
+  after the first load them instead of compiling the sources again.
 
-This environment is used in the Email class to render HTML templates for sending emails.
+This environment is used to build the email templates below, once per process.
 """
 jinja2_env = Environment(
     loader=PackageLoader("app", "templates"),
-    autoescape=select_autoescape(['html', 'xml'])
+    autoescape=select_autoescape(['html', 'xml']),
+    bytecode_cache=FileSystemBytecodeCache(settings.EMAIL_TEMPLATE_CACHE_DIR),
+)
+
+# the only variables an email template may use; they are filled in per email,
+# everything else is fixed when the template is built
+SEND_TIME_VARIABLES = ("subject", "name", "token_url")
+EMAIL_TEMPLATES = ("verification", "reset_password")
+
+# <style> blocks are kept for the @media rules, which cannot be inlined
+css_inliner = css_inline.CSSInliner(keep_style_tags=True)
+_built_templates = {}
+
+
+def build_template(template_name: str):
+    """
+    Builds an email template for sending.
+
+    Args:
+        template_name (str): The template name, without the .html suffix.
+
+    Returns:
+        Template: A compiled template of the flattened, CSS-inlined HTML, which
+        only fills in the SEND_TIME_VARIABLES.
+
+    The source is rendered once with each send-time variable replaced by its own
+    placeholder, which resolves extends and includes, the CSS is inlined into
+    the result, and what is left is compiled again.
+    """
+    placeholders = {name: Markup(f"{{{{ {name} }}}}") for name in SEND_TIME_VARIABLES}
+    flat = jinja2_env.get_template(f"{template_name}.html").render(**placeholders)
+    template = jinja2_env.from_string(css_inliner.inline(flat))
+    _built_templates[template_name] = template
+    return template
+
+
+def build_templates():
+    """Builds every email template; called from the app lifespan."""
+    for template_name in EMAIL_TEMPLATES:
+        build_template(template_name)
+
+
+def get_email_template(template_name: str):
+    return _built_templates.get(template_name) or build_template(template_name)
+
+logger = logging.getLogger("app.smtp")
+
+
+class _PooledConnection:
+    def __init__(self, smtp: aiosmtplib.SMTP):
+        self.smtp = smtp
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPPool:
+    """
+    Process-wide pool of connected, authenticated SMTP sessions, so each
+    email costs one SMTP transaction instead of a TCP + STARTTLS + AUTH
+    handshake.
+
+    At most `size` sessions are open at once. A session is retired after
+    `max_messages` messages or `idle_timeout` seconds unused, before the
+    server gets to drop it. A send that fails because a reused session went
+    away is retried once on a fresh one.
+
+    Only used from the event loop, so the bookkeeping needs no lock.
+    """
+
+    def __init__(self, size: int, max_messages: int, idle_timeout: float, timeout: float):
+        self.size = size
+        self.max_messages = max_messages
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+        self.connects = 0
+        self.reconnects = 0
+        self.sent = 0
+        self.failed = 0
+        self._send_total = 0.0
+        self._send_max = 0.0
+
+    async def _connect(self) -> _PooledConnection:
+        smtp = aiosmtplib.SMTP(
+            hostname=settings.EMAIL_HOST,
+            port=int(settings.EMAIL_PORT),
+            start_tls=settings.EMAIL_STARTTLS,
+            validate_certs=False,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+        if settings.EMAIL_USE_CREDENTIALS:
+            await smtp.login(settings.EMAIL_USERNAME, settings.EMAIL_PASSWORD)
+        self.connects += 1
+        return _PooledConnection(smtp)
+
+    async def _discard(self, conn: _PooledConnection):
+        try:
+            await conn.smtp.quit()
+        except Exception:
+            conn.smtp.close()
+
+    async def _checkout(self) -> _PooledConnection | None:
+        now = time.monotonic()
+        while self._idle:
+            conn = self._idle.pop()
+            if conn.smtp.is_connected and now - conn.last_used < self.idle_timeout:
+                return conn
+            await self._discard(conn)
+        return None
+
+    async def send(self, message: EmailMessage):
+        """
+        Send one message on a pooled session.
+
+        Raises:
+        aiosmtplib.SMTPException: If the message could not be sent.
+        """
+        async with self._slots:
+            conn = await self._checkout()
+            reused = conn is not None
+            started = time.perf_counter()
+            try:
+                if conn is None:
+                    conn = await self._connect()
+                try:
+                    await conn.smtp.send_message(message)
+                except (aiosmtplib.SMTPServerDisconnected, ConnectionError) as e:
+                    if not reused:
+                        raise
+                    # the server dropped the idle session; once more on a new one
+                    print(f"smtp pool: pooled session lost ({e}), reconnecting")
+                    self.reconnects += 1
+                    await self._discard(conn)
+                    conn = await self._connect()
+                    await conn.smtp.send_message(message)
+            except Exception as e:
+                self.failed += 1
+                if conn is not None and not isinstance(e, aiosmtplib.SMTPResponseException):
+                    await self._discard(conn)
+                elif conn is not None:
+                    # the server refused this message; the session is still fine
+                    self._idle.append(conn)
+                raise
+
+            elapsed = time.perf_counter() - started
+            self.sent += 1
+            self._send_total += elapsed
+            self._send_max = max(self._send_max, elapsed)
+            logger.info(json.dumps({
+                "event": "smtp_send",
+                "ms": round(elapsed * 1000, 2),
+                "reused": reused,
+                "recipients": len(message.get_all("To", [])),
+            }))
+
+            conn.sent += 1
+            conn.last_used = time.monotonic()
+            if conn.sent >= self.max_messages:
+                await self._discard(conn)
+            else:
+                self._idle.append(conn)
+
+    async def close(self):
+        """Quit every idle session; called from the app lifespan."""
+        while self._idle:
+            await self._discard(self._idle.pop())
+
+    def stats(self) -> dict:
+        """Session reuse and send latency for this worker process."""
+        return {
+            "size": self.size,
+            "idle": len(self._idle),
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "sent": self.sent,
+            "failed": self.failed,
+            "avg_send_ms": round(self._send_total / self.sent * 1000, 2) if self.sent else 0.0,
+            "max_send_ms": round(self._send_max * 1000, 2),
+        }
+
+
+smtp_pool = SMTPPool(
+    size=settings.EMAIL_POOL_SIZE,
+    max_messages=settings.EMAIL_MAX_MESSAGES_PER_CONNECTION,
+    idle_timeout=settings.EMAIL_IDLE_TIMEOUT_SECONDS,
+    timeout=settings.EMAIL_TIMEOUT_SECONDS,
 )
 
 class Email:
@@ -59,20 +256,8 @@ class Email:
             email = Email(name="John Doe", token="123456", email=["john.doe@example.com"])
             await email.sendMail("Verify your account", "verify_email")
         """
-        config = ConnectionConfig(
-            MAIL_USERNAME=settings.EMAIL_USERNAME,
-            MAIL_PASSWORD=settings.EMAIL_PASSWORD,
-            MAIL_FROM=settings.EMAIL_FROM,
-            MAIL_PORT=settings.EMAIL_PORT,
-            MAIL_SERVER=settings.EMAIL_HOST,
-            MAIL_STARTTLS=True,
-            MAIL_SSL_TLS=False,
-            USE_CREDENTIALS=True,
-            VALIDATE_CERTS=False
-        )
-
-        # load the template that should be used from the tamplates dir
-        template = jinja2_env.get_template(f"{template_name}.html")
+        # the template was flattened, CSS-inlined and compiled once per process
+        template = get_email_template(template_name)
 
         # pass the required variables to the template and render it
         html = template.render(
@@ -81,14 +266,11 @@ class Email:
             subject=subject_feild
         )
 
-        # schema for message to be sent by FastMail
-        message = MessageSchema(
-            subject=subject_feild,
-            recipients=self.email,
-            body=html,
-            subtype="html"
-        )
+        message = EmailMessage()
+        message["Subject"] = subject_feild
+        message["From"] = settings.EMAIL_FROM
+        message["To"] = ", ".join(self.email)
+        message.set_content(html, subtype="html")
 
-        # Send mail
-        fast_mail = FastMail(config)
-        await fast_mail.send_message(message)
\ No newline at end of file
+        # Send mail on a pooled SMTP session
+        await smtp_pool.send(message)
\ No newline at end of file
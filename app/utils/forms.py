@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""JSON fields carried inside multipart/form-data requests"""
+
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+
+
+def parse_form_json(schema: type[BaseModel], data: str) -> BaseModel:
+    """
+    Validates the JSON `data` field of a multipart request against `schema`.
+
+    Raises:
+    RequestValidationError: answered with the usual 422, as for a JSON body.
+    """
+    try:
+        return schema.model_validate_json(data)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", "data", *error["loc"])} for error in e.errors()]
+        )
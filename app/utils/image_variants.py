@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""resized WebP/JPEG copies of uploaded images, made on a background process pool"""
+
+from concurrent.futures import CancelledError, ProcessPoolExecutor, ThreadPoolExecutor
+import io
+import json
+import multiprocessing
+import threading
+
+from PIL import Image, ImageOps
+from sqlalchemy import cast, func
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.config.config import settings
+from app.engine.db_storage import DBStorage
+from app.models.fabric import Fabric
+from app.models.product import Product
+from app.utils.catalog import bump_catalog_version
+from app.utils.s3 import object_key, object_url, s3_client
+
+
+FORMATS = {
+    "webp": ("WEBP", "webp", "image/webp"),
+    "jpeg": ("JPEG", "jpg", "image/jpeg"),
+}
+
+# variant keys never change content, so browsers and CDNs may keep them
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+CATALOG_MODELS = (Product, Fabric)
+
+
+def _encode(image: Image.Image, format: str, quality: int) -> bytes:
+    pil_format = FORMATS[format][0]
+    has_alpha = image.mode in ("RGBA", "LA") or "transparency" in image.info
+    if pil_format == "JPEG":
+        if has_alpha:
+            # JPEG has no alpha channel; flatten onto white like a page would
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.convert("RGBA").getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+        options = {"quality": quality, "optimize": True, "progressive": True}
+    else:
+        image = image.convert("RGBA" if has_alpha else "RGB")
+        options = {"quality": quality, "method": 4}
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def render_variants(body: bytes, widths: list, formats: list, quality: int) -> tuple:
+    """
+    Resize an image to every width below its own, plus its own, in every format.
+
+    Parameters:
+    body (bytes): The original image.
+    widths (list): The target widths; images are never scaled up.
+    formats (list): Keys of FORMATS.
+    quality (int): The encoder quality, 1-100.
+
+    Returns:
+    tuple: (width, height, [(variant width, format, bytes), ...]) of the original.
+    """
+    with Image.open(io.BytesIO(body)) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+    width, height = image.size
+    targets = sorted({target for target in widths if target < width} | {width})
+    rendered = []
+    for target in targets:
+        if target == width:
+            resized = image
+        else:
+            # reducing_gap shrinks by whole factors first, which is much
+            # cheaper than resampling the full-size image every time
+            resized = image.resize(
+                (target, max(1, round(height * target / width))),
+                Image.LANCZOS,
+                reducing_gap=3.0,
+            )
+        for format in formats:
+            rendered.append((target, format, _encode(resized, format, quality)))
+    return width, height, rendered
+
+
+def _variant_key(key: str, width: int, format: str) -> str:
+    return f"{key.rsplit('.', 1)[0]}_{width}w.{FORMATS[format][1]}"
+
+
+def _manifest_key(key: str) -> str:
+    return f"{key.rsplit('.', 1)[0]}_variants.json"
+
+
+def _stored_entry(key: str, options: list) -> dict | None:
+    """The variants already made of `key` with these options, if any."""
+    try:
+        manifest = json.loads(
+            s3_client.get_object(Bucket=settings.S3_BUCKET_NAME, Key=_manifest_key(key))[
+                "Body"
+            ].read()
+        )
+    except s3_client.exceptions.NoSuchKey:
+        return None
+    return manifest["entry"] if manifest.get("options") == options else None
+
+
+def _derive(keys: dict, widths: list, formats: list, quality: int) -> tuple:
+    """
+    Worker process job: fetch the originals, render and store their variants.
+
+    Parameters:
+    keys (dict): image URL -> object key.
+
+    Returns:
+    tuple: ({url: variants entry}, {url: error}) for the image_variants column.
+
+    Note:
+    Originals are content-addressed, so an image attached to a second record
+    is usually stored with its variants already. A manifest next to them
+    records what was made, and is reused while the options are unchanged.
+    """
+    derived, errors = {}, {}
+    options = [widths, formats, quality]
+    for url, key in keys.items():
+        try:
+            entry = _stored_entry(key, options)
+            if entry is not None:
+                derived[url] = entry
+                continue
+            body = s3_client.get_object(Bucket=settings.S3_BUCKET_NAME, Key=key)["Body"].read()
+            width, height, rendered = render_variants(body, widths, formats, quality)
+            variants = []
+            for variant_width, format, data in rendered:
+                variant_key = _variant_key(key, variant_width, format)
+                s3_client.put_object(
+                    Bucket=settings.S3_BUCKET_NAME,
+                    Key=variant_key,
+                    Body=data,
+                    ContentType=FORMATS[format][2],
+                    CacheControl=CACHE_CONTROL,
+                )
+                variants.append(
+                    {"url": object_url(variant_key), "width": variant_width, "format": format}
+                )
+            derived[url] = {"width": width, "height": height, "variants": variants}
+            # written last, so it only exists once every variant does
+            s3_client.put_object(
+                Bucket=settings.S3_BUCKET_NAME,
+                Key=_manifest_key(key),
+                Body=json.dumps({"options": options, "entry": derived[url]}),
+                ContentType="application/json",
+            )
+        except Exception as e:
+            errors[url] = f"{type(e).__name__}: {e}"
+    return derived, errors
+
+
+def image_srcsets(images: list, image_variants: dict) -> list:
+    """
+    The srcset of every image, one per format, e.g.
+    {"webp": "<url> 320w, <url> 640w", "jpeg": "..."}; empty until the
+    variants of that image are recorded, or if they could not be made, so
+    clients fall back to the original.
+    """
+    srcsets = []
+    for url in images or []:
+        entry = (image_variants or {}).get(url) or {}
+        candidates = {}
+        for variant in entry.get("variants", []):
+            candidates.setdefault(variant["format"], []).append(
+                f"{variant['url']} {variant['width']}w"
+            )
+        srcsets.append({format: ", ".join(urls) for format, urls in candidates.items()})
+    return srcsets
+
+
+class ImageVariantPool:
+    """
+    Makes the variants of uploaded images on worker processes, so neither
+    the event loop, the threadpool of the sync routes nor the request that
+    uploaded them waits for Pillow.
+
+    Each job covers the new images of one record and is only submitted once
+    the transaction that attached them has committed. A single recorder
+    thread merges the results into the record's image_variants column.
+    At most `max_pending` jobs are queued; beyond that, images keep only
+    their original until backfilled. Images whose variants cannot be made,
+    e.g. a corrupt original, are recorded with their error instead, so a
+    backfill does not pick them again.
+
+    Jobs are submitted from request threads, so the counters take a lock.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._recorder = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._in_flight = {}  # (table, record id) -> jobs queued or running
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def start(self):
+        """Spawn the worker processes; called from the app lifespan."""
+        with self._lock:
+            if self._executor is None:
+                # spawn, not fork: the parent holds pool connections and threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._recorder = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="image-variants"
+                )
+
+    def shutdown(self):
+        with self._lock:
+            executor, recorder = self._executor, self._recorder
+            self._executor = self._recorder = None
+        if executor is not None:
+            # queued jobs are dropped; their images can be backfilled later
+            executor.shutdown(wait=False, cancel_futures=True)
+            recorder.shutdown(wait=True)
+
+    def full(self) -> bool:
+        with self._lock:
+            return self._pending >= self.max_pending
+
+    def queued(self, model, record_id: str) -> bool:
+        """True while a job for the record is queued or running."""
+        with self._lock:
+            return (model.__tablename__, record_id) in self._in_flight
+
+    def _done(self, model, record_id: str):
+        # called with the lock held
+        self._pending -= 1
+        key = (model.__tablename__, record_id)
+        self._in_flight[key] -= 1
+        if not self._in_flight[key]:
+            del self._in_flight[key]
+
+    def submit(self, model, record_id: str, urls: list) -> bool:
+        """
+        Queue the variants of `urls`, the images of one record.
+
+        Returns:
+        bool: False if nothing was queued, because none of the URLs is in our
+        bucket, the pool is not running or its queue is full.
+        """
+        keys = {url: object_key(url) for url in urls or []}
+        keys = {url: key for url, key in keys.items() if key}
+        if not keys:
+            return False
+        with self._lock:
+            if self._executor is None:
+                return False
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                print(f"image variants: queue full, skipping {model.__tablename__} {record_id}")
+                return False
+            self._pending += 1
+            key = (model.__tablename__, record_id)
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+            future = self._executor.submit(
+                _derive,
+                keys,
+                settings.IMAGE_VARIANT_WIDTHS,
+                settings.IMAGE_VARIANT_FORMATS,
+                settings.IMAGE_VARIANT_QUALITY,
+            )
+            recorder = self._recorder
+        # the callback runs on the executor's management thread, which must
+        # not block on the database
+        future.add_done_callback(
+            lambda done: self._hand_off(recorder, model, record_id, done)
+        )
+        return True
+
+    def _hand_off(self, recorder, model, record_id: str, future):
+        try:
+            recorder.submit(self._record, model, record_id, future)
+        except RuntimeError:
+            # cancelled or finished after shutdown, when the database may be
+            # gone already; the record is picked up by a backfill
+            with self._lock:
+                self._done(model, record_id)
+                self.failed += 1
+
+    def _record(self, model, record_id: str, future):
+        try:
+            derived, errors = future.result()
+        except CancelledError:
+            # dropped by shutdown, nothing is recorded so a backfill retries it
+            derived, errors = {}, {"*": "CancelledError: dropped at shutdown"}
+        except Exception as e:
+            # the pool failed, not the images; left for a backfill as well
+            derived, errors = {}, {"*": f"{type(e).__name__}: {e}"}
+        for url, error in errors.items():
+            print(f"image variants: {model.__tablename__} {record_id} {url}: {error}")
+        # images that failed in the worker are recorded, so a backfill skips them
+        outcome = {
+            **{url: {"error": error} for url, error in errors.items() if url != "*"},
+            **derived,
+        }
+        if outcome:
+            try:
+                record_variants(model, record_id, outcome)
+            except Exception as e:
+                print(f"image variants: failed to record {model.__tablename__} {record_id}: {e}")
+        with self._lock:
+            self._done(model, record_id)
+            self.completed += len(derived)
+            self.failed += len(errors)
+
+    def stats(self) -> dict:
+        """Queue depth and outcome counters for this worker process."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+            }
+
+
+def record_variants(model, record_id: str, derived: dict):
+    """
+    Merge `derived` into the record's image_variants in a single UPDATE, so
+    jobs finishing at the same time for one record do not overwrite each other.
+    """
+    db = DBStorage()
+    db.setup_db()
+    try:
+        db.query_eng(model).filter(model.id == record_id).update(
+            {
+                model.image_variants: func.coalesce(
+                    model.image_variants, cast({}, JSONB)
+                ).op("||")(cast(derived, JSONB))
+            },
+            synchronize_session=False,
+        )
+        if model in CATALOG_MODELS:
+            bump_catalog_version(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+image_variant_pool = ImageVariantPool(
+    workers=settings.IMAGE_VARIANT_WORKERS,
+    max_pending=settings.IMAGE_VARIANT_MAX_PENDING,
+)
+
+
+def backfill_variants(db, model, limit: int) -> int:
+    """
+    Queue the variants of images that have none recorded, e.g. uploaded
+    before the pipeline existed or dropped when its queue was full. Records
+    with a job in flight are skipped, and so are images recorded with an
+    error, so repeated calls run out of work.
+
+    Returns:
+    int: The number of records queued, at most `limit`.
+    """
+    queued = 0
+    records = (
+        db.query_eng(model)
+        .filter(model.images.isnot(None))
+        .order_by(model.created_at, model.id)
+        .yield_per(100)
+    )
+    for record in records:
+        if image_variant_pool.full():
+            break
+        if image_variant_pool.queued(model, record.id):
+            continue
+        recorded = record.image_variants or {}
+        missing = [url for url in record.images or [] if url not in recorded]
+        if missing and image_variant_pool.submit(model, record.id, missing):
+            queued += 1
+            if queued >= limit:
+                break
+    return queued
+
+
+def derive_variants(db, record, urls: list):
+    """
+    Make the variants of `urls`, new images of `record`, once the caller's
+    transaction commits; a rolled back request never gets them.
+    """
+    if not settings.IMAGE_VARIANTS_ENABLED or not urls:
+        return
+    model, record_id, urls = type(record), record.id, list(urls)
+    db.after_commit(lambda: image_variant_pool.submit(model, record_id, urls))
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""background delivery of the email outbox, with retries and backoff"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+import random
+
+from app.config.config import settings
+from app.engine.async_db_storage import AsyncDBStorage
+from app.models.email_outbox import EmailOutbox
+from app.utils.emails import Email
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def queue_email(recipient: str, subject: str, template: str, **context) -> EmailOutbox:
+    """
+    Build an outbox row for a templated email.
+
+    Parameters:
+    recipient (str): The address to send to.
+    subject (str): The subject line.
+    template (str): The template name, without the .html suffix.
+    context: The template variables; Email renders `name` and `token_url`.
+
+    Returns:
+    EmailOutbox: The row to add to the caller's session, so the mail is only
+    sent if the caller's transaction commits.
+    """
+    return EmailOutbox(
+        recipient=recipient,
+        subject=subject,
+        template=template,
+        context=context,
+        status="pending",
+        attempts=0,
+        next_attempt_at=_utcnow(),
+    )
+
+
+class OutboxWorker:
+    """
+    Drains the email outbox from an asyncio task in every app worker.
+
+    Due rows are claimed with FOR UPDATE SKIP LOCKED, so workers never send
+    the same row twice at once. Claiming also pushes next_attempt_at out by
+    the lease, so rows claimed by a worker that died are retried once the
+    lease runs out. Failed sends are retried with exponential backoff and
+    jitter until the attempts are used up.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        poll_interval: float,
+        max_attempts: int,
+        backoff_base: float,
+        backoff_max: float,
+        lease: float,
+    ):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self._task = None
+        self._wake = None
+
+    def start(self):
+        """Start draining; called from the app lifespan."""
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def wake(self):
+        """Drain now instead of at the next poll, e.g. after an enqueue commits."""
+        if self._wake is not None:
+            self._wake.set()
+
+    def backoff(self, attempts: int) -> timedelta:
+        """Delay before retry number `attempts`, with up to half of it as jitter."""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return timedelta(seconds=delay * random.uniform(0.5, 1.0))
+
+    async def _run(self):
+        while True:
+            try:
+                claimed = await self.drain_once()
+            except Exception as e:
+                print(f"email outbox: drain failed: {e}")
+                claimed = 0
+            if claimed == self.batch_size:
+                # probably more due right away
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _deliver(self, row: EmailOutbox):
+        context = row.context or {}
+        await Email(context.get("name"), context.get("token_url"), [row.recipient]).send_mail(
+            row.subject, row.template
+        )
+
+    async def drain_once(self) -> int:
+        """
+        Send one batch of due messages and record the outcomes.
+
+        Returns:
+        int: The number of rows claimed.
+        """
+        db = AsyncDBStorage(unit_of_work=True)
+        db.setup_db()
+        try:
+            now = _utcnow()
+            rows = await (
+                db.query_eng(EmailOutbox)
+                .filter(EmailOutbox.status == "pending", EmailOutbox.next_attempt_at <= now)
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            if not rows:
+                return 0
+            for row in rows:
+                row.attempts += 1
+                row.next_attempt_at = now + timedelta(seconds=self.lease)
+            # the claim is committed before sending, so no connection or row
+            # lock is held across the SMTP round trips
+            await db.commit()
+
+            results = await asyncio.gather(
+                *(self._deliver(row) for row in rows), return_exceptions=True
+            )
+
+            now = _utcnow()
+            for row, error in zip(rows, results):
+                row.updated_at = now
+                if error is None:
+                    row.status = "sent"
+                    row.sent_at = now
+                    row.last_error = None
+                    continue
+                row.last_error = f"{type(error).__name__}: {error}"
+                if row.attempts >= self.max_attempts:
+                    row.status = "failed"
+                    print(f"email outbox: giving up on {row.id}: {row.last_error}")
+                else:
+                    row.next_attempt_at = now + self.backoff(row.attempts)
+            await db.commit()
+            return len(rows)
+        except Exception:
+            await db.rollback()
+            raise
+        finally:
+            await db.close()
+
+
+outbox_worker = OutboxWorker(
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    poll_interval=settings.OUTBOX_POLL_SECONDS,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    backoff_base=settings.OUTBOX_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.OUTBOX_BACKOFF_MAX_SECONDS,
+    lease=settings.OUTBOX_LEASE_SECONDS,
+)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""keyset (cursor) pagination on (created_at, id)"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from fastapi import HTTPException, status
+from sqlalchemy import tuple_
+
+
+def encode_cursor(created_at: datetime, id: str) -> str:
+    """
+    Builds the opaque token pointing just after the given row.
+
+    Args:
+        created_at (datetime): created_at of the last row of a page.
+        id (str): id of the last row of a page.
+
+    Returns:
+        str: a url-safe token to pass back as `cursor`.
+    """
+    raw = json.dumps([created_at.isoformat(), id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """
+    Reverses encode_cursor.
+
+    Raises:
+        HTTPException: 400 if the token was not produced by encode_cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def paginate(query, created_at_column, id_column, cursor: str | None, limit: int):
+    """
+    Returns one page of `query` ordered by (created_at, id).
+
+    The page starts strictly after the cursor row using a row-value comparison,
+    so with an index on (created_at, id) every page costs the same as the first
+    one, however deep it is.
+
+    Args:
+        query: a SQLAlchemy query.
+        created_at_column, id_column: the ordering columns of the queried table.
+        cursor (str | None): token from a previous page, None for the first page.
+        limit (int): page size.
+
+    Returns:
+        tuple: (rows, next_cursor); next_cursor is None on the last page.
+    """
+    query = query.order_by(created_at_column, id_column)
+    if cursor:
+        query = query.filter(
+            tuple_(created_at_column, id_column) > tuple_(*decode_cursor(cursor))
+        )
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
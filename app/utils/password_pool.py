@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""bcrypt hashing and verification on a dedicated, bounded process pool"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import time
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from passlib.hash import bcrypt
+
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def configure(rounds: int):
+    """
+    Hash new passwords with `rounds` and have needs_update flag every hash
+    made with fewer. Stronger hashes are left alone, so hosts that calibrate
+    a round apart do not rehash each other's passwords back and forth.
+    """
+    pwd_context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+
+
+def calibrate_rounds(target_ms: float, min_rounds: int, max_rounds: int) -> int:
+    """
+    Pick the bcrypt cost for this hardware.
+
+    Parameters:
+    target_ms (float): The hash latency to aim for.
+    min_rounds (int): The floor, used even if it is slower than the target.
+    max_rounds (int): The ceiling.
+
+    Returns:
+    int: The highest rounds value whose hash takes at most `target_ms` here.
+
+    Note:
+    Each extra round doubles the work, so one timing at `min_rounds` (the
+    best of three, to discount a busy moment) predicts all the others.
+    """
+    handler = bcrypt.using(rounds=min_rounds)
+    elapsed = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        handler.hash("calibration")
+        elapsed = min(elapsed, time.perf_counter() - started)
+
+    rounds = min_rounds
+    while rounds < max_rounds and elapsed * 2 ** (rounds + 1 - min_rounds) * 1000 <= target_ms:
+        rounds += 1
+    print(
+        f"bcrypt calibration: {elapsed * 1000:.1f}ms at {min_rounds} rounds, "
+        f"using {rounds} rounds for a {target_ms:.0f}ms target"
+    )
+    return rounds
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify(password: str, password_hash: str) -> bool:
+    return pwd_context.verify(password, password_hash)
+
+
+class PasswordPool:
+    """
+    Runs bcrypt in worker processes, so it neither blocks the event loop
+    nor occupies the threadpool shared by the sync routes.
+
+    At most `workers` jobs run at once and at most `max_pending` callers
+    wait for a free worker; everyone else, and every job that is not done
+    within `timeout` seconds of being submitted, gets a 503 with
+    Retry-After instead of an ever longer queue.
+
+    All bookkeeping happens on the event loop, so it needs no lock.
+    """
+
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.rounds = None
+        self._executor = None
+        self._slots = None
+        self._in_flight = 0
+        self._waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._acquired = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def start(self, rounds: int | None = None):
+        """
+        Spawn the worker processes; called from the app lifespan.
+
+        Parameters:
+        rounds (int | None): The bcrypt cost for new hashes, applied here and
+        in every worker. passlib's default when None.
+        """
+        if rounds is not None:
+            self.rounds = rounds
+            configure(rounds)
+        if self._executor is None:
+            # spawn, not fork: the parent holds pool connections and threads
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=configure if self.rounds else None,
+                initargs=(self.rounds,) if self.rounds else (),
+            )
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._slots = None
+
+    def _busy(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=[{"msg": "The server is busy, please retry shortly"}],
+            headers={"Retry-After": str(max(1, round(self.timeout)))},
+        )
+
+    def _replace(self, executor):
+        """A worker died; drop the pool so later calls get fresh workers."""
+        if self._executor is executor:
+            print("password pool: worker process died, restarting the pool")
+            executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _release(self, slots):
+        self._in_flight -= 1
+        slots.release()
+
+    async def run(self, fn, *args):
+        """
+        Run `fn(*args)` on a worker process.
+
+        Raises:
+        HTTPException: 503 when the queue is full or the job timed out.
+        """
+        self.start()
+        if self._waiting >= self.max_pending:
+            self.rejected += 1
+            raise self._busy()
+
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        slots = self._slots
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise self._busy()
+        finally:
+            self._waiting -= 1
+
+        waited = time.monotonic() - started
+        self._acquired += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        self._in_flight += 1
+        # another call may have replaced a broken pool while this one waited
+        self.start()
+        executor = self._executor
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            # no future, so no callback will free the slot
+            self._release(slots)
+            self._replace(executor)
+            raise self._busy()
+        # the slot is freed when the worker is, not when the caller gives up
+        future.add_done_callback(
+            lambda _: loop.call_soon_threadsafe(self._release, slots)
+        )
+        try:
+            result = await asyncio.wait_for(
+                asyncio.wrap_future(future), self.timeout - waited
+            )
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise self._busy()
+        except BrokenProcessPool:
+            self._replace(executor)
+            raise self._busy()
+        self.completed += 1
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self.run(_hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self.run(_verify, password, password_hash)
+
+    def stats(self) -> dict:
+        """Queue depth and outcome counters for this worker process."""
+        acquired = self._acquired
+        return {
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": (
+                round(self._wait_total / acquired * 1000, 2) if acquired else 0.0
+            ),
+            "max_wait_ms": round(self._wait_max * 1000, 2),
+        }
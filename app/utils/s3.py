@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""shared S3 client and concurrent, content-addressed image uploads"""
+
+import asyncio
+import base64
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+import functools
+import hashlib
+
+import anyio
+import boto3
+from botocore.config import Config
+from fastapi import HTTPException
+
+from app.config.config import settings
+
+
+# boto3 clients are thread-safe; one per process, with enough pooled
+# connections for every upload worker
+s3_client = boto3.client(
+    "s3",
+    region_name=settings.S3_REGION,
+    aws_access_key_id=settings.S3_ACCESS_KEY,
+    aws_secret_access_key=settings.S3_SECRET_KEY,
+    endpoint_url=settings.S3_ENDPOINT_URL,
+    config=Config(max_pool_connections=max(10, settings.S3_UPLOAD_WORKERS)),
+)
+
+# bounds the uploads in flight across all requests of this process
+_upload_executor = ThreadPoolExecutor(
+    max_workers=settings.S3_UPLOAD_WORKERS, thread_name_prefix="s3-upload"
+)
+
+# S3 rejects smaller parts, except for the last one
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+EXTENSIONS = {"image/jpeg": "jpg", "image/png": "png", "image/webp": "webp"}
+# non-standard types some clients put in data URLs
+CONTENT_TYPE_ALIASES = {"image/jpg": "image/jpeg"}
+
+# uploaded images are stored under the sha256 of their bytes, see content_key
+CONTENT_PREFIX = "images/"
+
+
+def object_url(key: str) -> str:
+    """The public URL of an object in the bucket."""
+    if settings.S3_ENDPOINT_URL:
+        return f"{settings.S3_ENDPOINT_URL.rstrip('/')}/{settings.S3_BUCKET_NAME}/{key}"
+    return f"https://{settings.S3_BUCKET_NAME}.s3.{settings.S3_REGION}.amazonaws.com/{key}"
+
+
+def object_key(url: str) -> str | None:
+    """The key of an object_url in the bucket, None for URLs stored elsewhere."""
+    prefix = object_url("")
+    if isinstance(url, str) and url.startswith(prefix) and len(url) > len(prefix):
+        return url[len(prefix):]
+    return None
+
+
+def content_key(digest: str, extension: str) -> str:
+    """
+    The object key of content with this sha256 hex digest. Equal bytes get
+    equal keys, so an image uploaded twice is stored once, under one URL.
+    """
+    return f"{CONTENT_PREFIX}{digest}.{extension}"
+
+
+def image_extension(content_type: str) -> str:
+    """
+    The extension of an allowed image content type. Every upload path maps
+    types the same way, so equal bytes always end up under one key.
+
+    Raises:
+    ValueError: if the type is not in UPLOAD_ALLOWED_CONTENT_TYPES.
+    """
+    if content_type not in settings.UPLOAD_ALLOWED_CONTENT_TYPES:
+        raise ValueError(f"unsupported content type {content_type}")
+    return EXTENSIONS.get(content_type, content_type.split("/")[1])
+
+
+def file_digest(file) -> str:
+    """The sha256 hex digest of a seekable file, which is rewound afterwards."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(functools.partial(file.read, 1024 * 1024), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def decode_base64_image(image_base64: str) -> tuple:
+    """
+    Decode a `data:image/<ext>;base64,...` string.
+
+    Parameters:
+    image_base64 (str): The data URL.
+
+    Returns:
+    tuple: (key, body, content_type) for upload_objects; the key is the
+    content_key of the decoded bytes.
+
+    Raises:
+    ValueError: if the data URL is malformed or not an allowed image type.
+    """
+    header, image_data = image_base64.split(";base64,")
+    content_type = header.removeprefix("data:").strip().lower()
+    content_type = CONTENT_TYPE_ALIASES.get(content_type, content_type)
+    extension = image_extension(content_type)
+    body = base64.b64decode(image_data)
+    key = content_key(hashlib.sha256(body).hexdigest(), extension)
+    return key, body, content_type
+
+
+def presign_upload(key: str, content_type: str, max_bytes: int) -> dict:
+    """
+    A presigned POST that lets the client upload one object straight to S3.
+
+    Parameters:
+    key (str): The only key the form may write.
+    content_type (str): The only content type it may declare.
+    max_bytes (int): The largest body S3 will accept.
+
+    Returns:
+    dict: The form `url` and the `fields` to post along with the file.
+    """
+    return s3_client.generate_presigned_post(
+        Bucket=settings.S3_BUCKET_NAME,
+        Key=key,
+        Fields={"Content-Type": content_type},
+        Conditions=[
+            {"Content-Type": content_type},
+            ["content-length-range", 1, max_bytes],
+        ],
+        ExpiresIn=settings.UPLOAD_URL_EXPIRES_SECONDS,
+    )
+
+
+def _head(key: str):
+    try:
+        return s3_client.head_object(Bucket=settings.S3_BUCKET_NAME, Key=key)
+    except s3_client.exceptions.ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+
+
+def head_objects(keys: list) -> list:
+    """The head_object response of every key, None for missing ones, fetched concurrently."""
+    return list(_upload_executor.map(_head, keys))
+
+
+def _put(key: str, body, content_type: str):
+    s3_client.put_object(
+        Bucket=settings.S3_BUCKET_NAME, Key=key, Body=body, ContentType=content_type
+    )
+
+
+def _put_new(key: str, body, content_type: str) -> bool:
+    """put_object unless the key is already stored; True if it was written."""
+    if _head(key) is not None:
+        return False
+    _put(key, body, content_type)
+    return True
+
+
+def delete_objects(keys: list):
+    """Best-effort removal of objects, e.g. a presigned upload that does not match its session."""
+    if not keys:
+        return
+    try:
+        s3_client.delete_objects(
+            Bucket=settings.S3_BUCKET_NAME,
+            Delete={"Objects": [{"Key": key} for key in keys], "Quiet": True},
+        )
+    except Exception as e:
+        print(f"Failed to delete objects {keys}: {e}")
+
+
+def upload_objects(uploads: list) -> list:
+    """
+    Upload several content-addressed objects concurrently on the shared
+    upload workers. Keys that are already stored, or repeated within
+    `uploads`, are not uploaded again.
+
+    Parameters:
+    uploads (list): (key, body, content_type) tuples, keyed by content_key.
+
+    Returns:
+    list: The object URLs, in the order of `uploads`.
+
+    Raises:
+    HTTPException: 400 naming the first upload that failed. Those not started
+    yet are cancelled. Objects that were already written are kept: other
+    records may share them, and a retry finds them instead of uploading again.
+    """
+    unique = {}
+    for upload in uploads:
+        unique.setdefault(upload[0], upload)
+    futures = {key: _upload_executor.submit(_put_new, *upload) for key, upload in unique.items()}
+    done, pending = wait(futures.values(), return_when=FIRST_EXCEPTION)
+    if any(future.exception() for future in done):
+        for future in pending:
+            future.cancel()
+        index, error = next(
+            (index, futures[key].exception())
+            for index, (key, _, _) in enumerate(uploads)
+            if futures[key] in done and futures[key].exception()
+        )
+        raise HTTPException(
+            status_code=400, detail=f"Failed to process image {index+1}: {str(error)}"
+        )
+    return [object_url(key) for key, _, _ in uploads]
+
+
+def upload_base64_images(images: list) -> list:
+    """
+    Decode and upload base64 images concurrently; objects already written
+    are kept and reused on retry.
+
+    Parameters:
+    images (list): `data:image/<ext>;base64,...` strings.
+
+    Returns:
+    list: The image URLs, in the order of `images`. They only depend on the
+    image bytes, so the same image always gets the same URL.
+
+    Raises:
+    HTTPException: 400 if an image cannot be decoded, before anything is
+    written, or if an upload fails.
+    """
+    uploads = []
+    for index, image_base64 in enumerate(images):
+        try:
+            uploads.append(decode_base64_image(image_base64))
+        except Exception as e:
+            raise HTTPException(
+                status_code=400, detail=f"Failed to process image {index+1}: {str(e)}"
+            )
+    return upload_objects(uploads)
+
+
+async def _run(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _upload_executor, functools.partial(fn, *args, **kwargs)
+    )
+
+
+async def stream_upload(file, key: str, content_type: str, slots=None) -> str:
+    """
+    Stream a file to S3 in parts, without blocking the event loop.
+
+    Parameters:
+    file (UploadFile): The file to read, S3_MULTIPART_PART_SIZE bytes at a time.
+    key (str): The object key.
+    content_type (str): The object content type.
+    slots (asyncio.Semaphore, optional): Parts in flight, shared by every file
+    of a request; S3_MULTIPART_CONCURRENCY of them when not given.
+
+    Returns:
+    str: The object URL.
+
+    Raises:
+    Exception: Whatever S3 raised; a started multipart upload is aborted first,
+    so no orphaned parts are left behind.
+
+    Note:
+    A file smaller than one part is stored with a single put_object. Larger
+    ones become a multipart upload. A part is only read while holding a slot,
+    which its upload gives back, so a request holds at most one part per slot
+    in memory, however many files it streams.
+    """
+    part_size = max(MIN_PART_SIZE, settings.S3_MULTIPART_PART_SIZE)
+    if slots is None:
+        slots = asyncio.Semaphore(settings.S3_MULTIPART_CONCURRENCY)
+    upload_id = None
+    parts, tasks = [], []
+
+    async def send(number: int, body: bytes):
+        try:
+            response = await _run(
+                s3_client.upload_part,
+                Bucket=settings.S3_BUCKET_NAME,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=number,
+                Body=body,
+            )
+            parts.append({"PartNumber": number, "ETag": response["ETag"]})
+        finally:
+            slots.release()
+
+    try:
+        number = 0
+        while True:
+            await slots.acquire()
+            handed_off = False
+            try:
+                # stop reading as soon as any part failed
+                for task in tasks:
+                    if task.done() and task.exception():
+                        raise task.exception()
+                chunk = await file.read(part_size)
+                if number == 0 and len(chunk) < part_size:
+                    await _run(_put, key, chunk, content_type)
+                    return object_url(key)
+                if not chunk:
+                    break
+                if upload_id is None:
+                    upload = await _run(
+                        s3_client.create_multipart_upload,
+                        Bucket=settings.S3_BUCKET_NAME,
+                        Key=key,
+                        ContentType=content_type,
+                    )
+                    upload_id = upload["UploadId"]
+                number += 1
+                tasks.append(asyncio.create_task(send(number, chunk)))
+                handed_off = True
+            finally:
+                if not handed_off:
+                    slots.release()
+        await asyncio.gather(*tasks)
+        await _run(
+            s3_client.complete_multipart_upload,
+            Bucket=settings.S3_BUCKET_NAME,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": sorted(parts, key=lambda part: part["PartNumber"])},
+        )
+    except BaseException:
+        if upload_id is not None:
+            # let the parts in flight settle, or the abort could miss them
+            await asyncio.gather(*tasks, return_exceptions=True)
+            try:
+                await _run(
+                    s3_client.abort_multipart_upload,
+                    Bucket=settings.S3_BUCKET_NAME,
+                    Key=key,
+                    UploadId=upload_id,
+                )
+            except Exception as e:
+                print(f"Failed to abort multipart upload {upload_id} of {key}: {e}")
+        raise
+    return object_url(key)
+
+
+async def stream_uploads(uploads: list) -> list:
+    """
+    Stream several content-addressed files to S3 concurrently. Keys that are
+    already stored, or repeated within `uploads`, are not uploaded again.
+
+    Parameters:
+    uploads (list): (file, key, content_type) tuples, keyed by content_key.
+
+    Returns:
+    list: The object URLs, in the order of `uploads`.
+
+    Raises:
+    HTTPException: 400 naming the first file that failed. As in
+    upload_objects, the objects of the others are kept for a retry.
+    """
+    slots = asyncio.Semaphore(settings.S3_MULTIPART_CONCURRENCY)
+
+    async def upload_new(file, key: str, content_type: str):
+        if await _run(_head, key) is None:
+            await stream_upload(file, key, content_type, slots)
+
+    unique = {}
+    for upload in uploads:
+        unique.setdefault(upload[1], upload)
+    results = await asyncio.gather(
+        *(upload_new(*upload) for upload in unique.values()), return_exceptions=True
+    )
+    errors = {
+        key: result
+        for key, result in zip(unique, results)
+        if isinstance(result, BaseException)
+    }
+    for index, (_, key, _) in enumerate(uploads):
+        if key in errors:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Failed to process image {index+1}: {str(errors[key])}",
+            )
+    return [object_url(key) for _, key, _ in uploads]
+
+
+def stream_form_images(images: list) -> list:
+    """
+    Stream the image parts of a multipart request to S3, from a sync route.
+
+    Parameters:
+    images (list): UploadFile parts; only UPLOAD_ALLOWED_CONTENT_TYPES are accepted.
+
+    Returns:
+    list: The image URLs, in the order of `images`; like upload_base64_images,
+    they only depend on the image bytes.
+
+    Raises:
+    HTTPException: 400 if a part is not an allowed image, before anything is
+    written, or if an upload fails.
+
+    Note:
+    Must be called from a threadpool worker, e.g. a plain `def` route; the
+    uploads themselves run on the event loop.
+    """
+    uploads = []
+    for index, image in enumerate(images):
+        try:
+            extension = image_extension(image.content_type)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=400, detail=f"Failed to process image {index+1}: {str(e)}"
+            )
+        # the part is already spooled locally, hashing it first is cheap
+        key = content_key(file_digest(image.file), extension)
+        uploads.append((image, key, image.content_type))
+    if not uploads:
+        return []
+    return anyio.from_thread.run(stream_uploads, uploads)
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""sliding-window login throttling, per client IP and per account email"""
+
+from collections import OrderedDict, deque
+import math
+import time
+
+from fastapi import HTTPException, Request, status
+
+from app.config.config import settings
+
+
+class MemoryWindowStore:
+    """
+    Sliding-window log kept in this process. Each key holds the times of
+    its accepted attempts within the window, at most `limit` of them, and
+    the least recently used keys are dropped beyond `max_keys`.
+
+    Only used from the event loop, and hit never awaits, so it needs no lock.
+    """
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._hits = OrderedDict()  # key -> deque of monotonic times
+
+    def _window(self, key: str, now: float, window: float) -> deque:
+        hits = self._hits.get(key)
+        if hits is None:
+            hits = self._hits[key] = deque()
+            while len(self._hits) > self.max_keys:
+                self._hits.popitem(last=False)
+        else:
+            self._hits.move_to_end(key)
+        while hits and hits[0] <= now - window:
+            hits.popleft()
+        return hits
+
+    async def hit(self, limits: list) -> float:
+        """
+        Record an attempt against every (key, limit, window) of `limits`,
+        unless one of the keys already made `limit` attempts within the last
+        `window` seconds; then nothing is recorded.
+
+        Returns:
+        float: 0 if the attempt is allowed, else seconds until it would be.
+        """
+        now = time.monotonic()
+        windows = [(self._window(key, now, window), limit, window) for key, limit, window in limits]
+        retry_after = max(
+            (hits[0] + window - now for hits, limit, window in windows if len(hits) >= limit),
+            default=0.0,
+        )
+        if retry_after:
+            return retry_after
+        for hits, _, _ in windows:
+            hits.append(now)
+        return 0.0
+
+    async def reset(self, key: str):
+        self._hits.pop(key, None)
+
+
+# trims every key's sorted set to its window, then records the attempt in
+# all of them unless one window is full; returns 0 or the milliseconds until
+# a slot frees up. ARGV: now, member, then window and limit per key
+_REDIS_HIT = """
+local now = tonumber(ARGV[1])
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local window = tonumber(ARGV[1 + 2 * i])
+    local limit = tonumber(ARGV[2 + 2 * i])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    if redis.call('ZCARD', key) >= limit then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        wait = math.max(wait, 1, tonumber(oldest[2]) + window - now)
+    end
+end
+if wait > 0 then
+    return wait
+end
+for i, key in ipairs(KEYS) do
+    local window = tonumber(ARGV[1 + 2 * i])
+    redis.call('ZADD', key, now, ARGV[2])
+    redis.call('PEXPIRE', key, window)
+end
+return 0
+"""
+
+
+class RedisWindowStore:
+    """
+    The same sliding-window log in Redis, shared by every worker. A single
+    script call per key keeps trimming, counting and recording atomic.
+    """
+
+    def __init__(self, url: str):
+        # optional dependency, only needed when a shared backend is configured
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(_REDIS_HIT)
+
+    async def hit(self, limits: list) -> float:
+        now_ms = time.time_ns() // 1_000_000
+        # the member only has to be unique per attempt
+        member = f"{now_ms}:{time.perf_counter_ns()}"
+        args = [now_ms, member]
+        for _, limit, window in limits:
+            args += [int(window * 1000), limit]
+        wait_ms = await self._script(keys=[key for key, _, _ in limits], args=args)
+        return max(0, int(wait_ms)) / 1000
+
+    async def reset(self, key: str):
+        await self._redis.delete(key)
+
+
+def client_ip(request: Request) -> str | None:
+    """
+    The address to throttle a request by. Behind a reverse proxy that is not
+    the peer, so LOGIN_THROTTLE_CLIENT_IP_HEADER names the header the proxy
+    sets it in; for X-Forwarded-For, the entry the proxy appended (the last).
+    """
+    header = settings.LOGIN_THROTTLE_CLIENT_IP_HEADER
+    if header:
+        value = request.headers.get(header, "").split(",")[-1].strip()
+        if value:
+            return value
+    return request.client.host if request.client else None
+
+
+class LoginThrottle:
+    """
+    Limits sign-in attempts per client IP and per normalized email, so
+    that credential stuffing is turned away with a 429 before it costs a
+    bcrypt verification. Rejected attempts are not recorded.
+
+    When the shared store is unreachable, the throttle falls back to the
+    in-process one rather than blocking every sign-in.
+    """
+
+    def __init__(self, shared_url: str | None = None):
+        self._memory = MemoryWindowStore(settings.LOGIN_THROTTLE_MAX_KEYS)
+        self._shared = RedisWindowStore(shared_url) if shared_url else None
+
+    async def _hit(self, limits: list) -> float:
+        if self._shared is not None:
+            try:
+                return await self._shared.hit(limits)
+            except Exception as e:
+                print(f"login throttle: shared store unavailable ({e}), using local")
+        return await self._memory.hit(limits)
+
+    async def check(self, ip: str | None, email: str):
+        """
+        Record a sign-in attempt.
+
+        Parameters:
+        ip (str | None): The client address.
+        email (str): The normalized email the attempt is for.
+
+        Raises:
+        HTTPException: 429 with Retry-After if either limit is exhausted. The
+        limits are checked together, so a rejected attempt counts against none.
+        """
+        if not settings.LOGIN_THROTTLE_ENABLED:
+            return
+        limits = [
+            (
+                f"login:email:{email}",
+                settings.LOGIN_THROTTLE_EMAIL_LIMIT,
+                settings.LOGIN_THROTTLE_EMAIL_WINDOW_SECONDS,
+            )
+        ]
+        if ip:
+            limits.insert(
+                0,
+                (
+                    f"login:ip:{ip}",
+                    settings.LOGIN_THROTTLE_IP_LIMIT,
+                    settings.LOGIN_THROTTLE_IP_WINDOW_SECONDS,
+                ),
+            )
+        retry_after = await self._hit(limits)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=[{"msg": "Too many sign-in attempts, please try again later"}],
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    async def succeeded(self, email: str):
+        """Forget the failed attempts for an account once its owner signs in."""
+        if not settings.LOGIN_THROTTLE_ENABLED:
+            return
+        key = f"login:email:{email}"
+        if self._shared is not None:
+            try:
+                await self._shared.reset(key)
+            except Exception as e:
+                print(f"login throttle: shared store unavailable ({e})")
+        await self._memory.reset(key)
+
+
+login_throttle = LoginThrottle(settings.LOGIN_THROTTLE_REDIS_URL)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""presigned direct-to-S3 image uploads, issued and confirmed in two steps"""
+
+import uuid
+
+from fastapi import HTTPException, status
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+from app.config.config import settings
+from app.utils.s3 import (
+    delete_objects,
+    head_objects,
+    image_extension,
+    object_url,
+    presign_upload,
+)
+
+
+# signs the upload session handed to the client, so confirm only ever
+# attaches keys this API issued, to the user it issued them to
+upload_session_serializer = URLSafeTimedSerializer(
+    settings.JWT_SECRET_KEY, salt="upload-session"
+)
+
+
+def create_upload_session(target: str, owner_id: str, files: list) -> dict:
+    """
+    Issues one presigned POST per file.
+
+    Parameters:
+    target (str): What the images are for: product, fabric or measurement.
+    owner_id (str): The id of the user uploading.
+    files (list): UploadFileSpec items; each POST only accepts the declared
+    content type and at most the declared size.
+
+    Returns:
+    dict: The signed `session` to confirm with, and the `uploads` to post.
+    """
+    uploads, entries = [], []
+    for spec in files:
+        extension = image_extension(spec.content_type)
+        key = f"uploads/{target}/{owner_id}/{uuid.uuid4()}.{extension}"
+        presigned = presign_upload(key, spec.content_type, spec.size)
+        uploads.append({"key": key, "url": presigned["url"], "fields": presigned["fields"]})
+        entries.append([key, spec.content_type, spec.size])
+
+    session = upload_session_serializer.dumps(
+        {"target": target, "owner": owner_id, "files": entries}
+    )
+    return {
+        "session": session,
+        "uploads": uploads,
+        "expires_in": settings.UPLOAD_URL_EXPIRES_SECONDS,
+    }
+
+
+def read_upload_session(session: str, owner_id: str) -> dict:
+    """
+    Verifies an upload session issued to `owner_id`.
+
+    Raises:
+    HTTPException: 400 if it was tampered with, expired or issued to someone else.
+    """
+    try:
+        data = upload_session_serializer.loads(
+            session, max_age=settings.UPLOAD_SESSION_MAX_AGE_SECONDS
+        )
+    except SignatureExpired:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=[{"msg": "Upload session expired"}],
+        )
+    except BadSignature:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=[{"msg": "Invalid upload session"}],
+        )
+    if data["owner"] != owner_id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=[{"msg": "Invalid upload session"}],
+        )
+    return data
+
+
+def confirm_uploads(session: dict) -> list:
+    """
+    Checks that every file of a session reached S3 as declared.
+
+    Returns:
+    list: The object URLs, in the order the files were declared.
+
+    Raises:
+    HTTPException: 400 if a file is missing, or was stored with another
+    content type or a larger size; those objects are deleted.
+    """
+    files = session["files"]
+    heads = head_objects([key for key, _, _ in files])
+    for index, ((key, content_type, size), head) in enumerate(zip(files, heads)):
+        if head is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=[{"msg": f"Image {index+1} has not been uploaded"}],
+            )
+        if head.get("ContentType") != content_type or head["ContentLength"] > size:
+            delete_objects([key])
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=[{"msg": f"Image {index+1} does not match its upload session"}],
+            )
+    return [object_url(key) for key, _, _ in files]
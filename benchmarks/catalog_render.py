@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Compares requests/sec of a catalog page served the old way (ORM objects
+encoded by FastAPI on every request) with the pre-rendered, pre-compressed
+payloads of app.utils.catalog. No database is needed, the catalog version
+is pinned and the products are built in memory:
+
+    python -m benchmarks.catalog_render --products 200 --requests 2000
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.models import cart, customer, fabric, fabric_price, measurements  # noqa: F401
+from app.models.product import Product
+from app.models.product_category import ProductCategory  # noqa: F401
+from app.utils import catalog
+
+
+def build_app(products):
+    catalog.catalog_version = lambda db: (1, datetime.utcnow())
+    columns = Product.__table__.columns
+    app = FastAPI()
+
+    @app.get("/current")
+    def current():
+        return products
+
+    @app.get("/prerendered")
+    def prerendered(request: Request):
+        def render():
+            data = [{c.name: getattr(p, c.name) for c in columns} for p in products]
+            return data, {}
+
+        return catalog.catalog_response(request, None, "bench", (), render)
+
+    return app
+
+
+def measure(client, path, requests, encoding):
+    client.get(path, headers={"accept-encoding": encoding})  # warm up / render once
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get(path, headers={"accept-encoding": encoding})
+    elapsed = time.perf_counter() - start
+    size = response.headers["content-length"]  # on the wire, before decoding
+    print(f"  {path:<13} {encoding:<9} {requests / elapsed:8.1f} req/s  {size} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    products = [
+        Product(
+            name=f"Product {i}",
+            price=100.0 + i,
+            description="Bespoke two piece suit " * 5,
+            category_id="category",
+            images=[f"https://example.com/{i}-{n}.jpg" for n in range(3)],
+        )
+        for i in range(args.products)
+    ]
+    client = TestClient(build_app(products))
+    print(f"{args.products} products per page, {args.requests} requests")
+    measure(client, "/current", args.requests, "identity")
+    for encoding in ("identity", "gzip", "br"):
+        measure(client, "/prerendered", args.requests, encoding)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Fires concurrent requests at a running server and reports throughput and
+latency percentiles. Run it against the same route before and after a
+change, e.g. the async routes moved to load_async:
+
+    python benchmarks/concurrency.py http://localhost:8000/payment/paystack_webhook \
+        --method POST --concurrency 50 --requests 2000
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def worker(client, args, latencies, statuses, remaining):
+    while remaining[0] > 0:
+        remaining[0] -= 1
+        start = time.perf_counter()
+        try:
+            response = await client.request(args.method, args.url, content=args.body)
+            outcome = response.status_code
+        except httpx.HTTPError as e:
+            # timeouts and dropped connections are results too, not a reason to stop
+            outcome = type(e).__name__
+        latencies.append(time.perf_counter() - start)
+        statuses[outcome] = statuses.get(outcome, 0) + 1
+
+
+async def run(args):
+    latencies, statuses, remaining = [], {}, [args.requests]
+    headers = dict(
+        (name.strip(), value.strip())
+        for name, value in (h.split(":", 1) for h in args.header)
+    )
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        headers=headers, limits=limits, timeout=args.timeout
+    ) as client:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                worker(client, args, latencies, statuses, remaining)
+                for _ in range(args.concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+    print(f"{args.method} {args.url} concurrency={args.concurrency}")
+    print(f"  requests/sec: {len(latencies) / elapsed:.1f}")
+    print(
+        f"  latency ms: mean={statistics.mean(latencies) * 1000:.1f} "
+        f"p50={pct(0.50):.1f} p95={pct(0.95):.1f} p99={pct(0.99):.1f}"
+    )
+    print(f"  statuses: {statuses}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("url")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--body", default=None)
+    parser.add_argument("--header", action="append", default=[], help="Name: value")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds per request")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Compares renders/sec of the verification email rendered the old way (the
+full template, with its extends and includes, on every email) with the
+templates app.utils.emails builds once, flattened and CSS-inlined. Also
+times a first compile against a cold and a warm bytecode cache:
+
+    python -m benchmarks.email_render --renders 5000
+"""
+
+import argparse
+import tempfile
+import time
+
+from jinja2 import Environment, FileSystemBytecodeCache, PackageLoader, select_autoescape
+
+from app.utils import emails
+
+
+def context(i):
+    return {
+        "name": f"Customer {i}",
+        "token_url": f"https://api.joshsamuels.co/auth/verify_email/token-{i}",
+        "subject": "Your Verification Link",
+    }
+
+
+def measure(label, render, renders):
+    render(context(0))  # warm up
+    start = time.perf_counter()
+    for i in range(renders):
+        html = render(context(i))
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<30} {renders / elapsed:10.1f} renders/s  {len(html)} chars")
+
+
+def compile_time(cache_dir):
+    env = Environment(
+        loader=PackageLoader("app", "templates"),
+        autoescape=select_autoescape(["html", "xml"]),
+        bytecode_cache=FileSystemBytecodeCache(cache_dir),
+    )
+    start = time.perf_counter()
+    env.get_template("verification.html").render(context(0))
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--renders", type=int, default=5000)
+    args = parser.parse_args()
+
+    old_env = Environment(
+        loader=PackageLoader("app", "templates"),
+        autoescape=select_autoescape(["html", "xml"]),
+    )
+
+    def before(ctx):
+        return old_env.get_template("verification.html").render(**ctx)
+
+    def before_inlined(ctx):
+        return emails.css_inliner.inline(before(ctx))
+
+    def after(ctx):
+        return emails.get_email_template("verification").render(**ctx)
+
+    print(f"verification email, {args.renders} renders")
+    measure("full template (before)", before, args.renders)
+    measure("full template + inline CSS", before_inlined, args.renders)
+    measure("prebuilt (after)", after, args.renders)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = compile_time(cache_dir)
+        warm = compile_time(cache_dir)
+    print(f"  first compile: {cold:.1f}ms cold, {warm:.1f}ms from the bytecode cache")
+
+
+if __name__ == "__main__":
+    main()
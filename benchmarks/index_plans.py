@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Seeds synthetic catalog/user rows and prints the query plans of the hot
+lookups, so the effect of the index migration can be compared:
+
+    python -m benchmarks.index_plans --seed 200000   # seed, then plans
+    alembic downgrade ad44ef3c7cf2 && python -m benchmarks.index_plans
+    alembic upgrade head && python -m benchmarks.index_plans
+    python -m benchmarks.index_plans --cleanup
+
+Seeded rows all have ids starting with "bench-".
+"""
+
+import argparse
+
+from sqlalchemy import create_engine, text
+
+from app.engine.db_storage import db_url
+
+
+SEED = [
+    """
+    INSERT INTO product_categories (id, created_at, updated_at, name)
+    SELECT 'bench-c-' || g, now(), now(), 'bench category ' || g
+    FROM generate_series(1, 20) g
+    """,
+    """
+    INSERT INTO users (id, created_at, updated_at, email, phone, password_hash, is_verified, role)
+    SELECT 'bench-u-' || g, now(), now(), 'Bench' || g || '@Example.com', 'bench-' || g,
+        'x', true, 'customer'
+    FROM generate_series(1, :n) g
+    """,
+    """
+    INSERT INTO customers (id, first_name, last_name)
+    SELECT 'bench-u-' || g, 'Bench', 'User' FROM generate_series(1, :n) g
+    """,
+    """
+    INSERT INTO products (id, created_at, updated_at, name, price, category_id, images)
+    SELECT 'bench-p-' || g, now(), now(), 'bench product ' || g, 100,
+        'bench-c-' || (g % 20 + 1), '[]'
+    FROM generate_series(1, :n) g
+    """,
+    """
+    INSERT INTO fabrics (id, created_at, updated_at, name, category, images)
+    SELECT 'bench-f-' || g, now(), now(), 'bench fabric ' || g, 'bench', '[]'
+    FROM generate_series(1, GREATEST(:n / 10, 1)) g
+    """,
+    """
+    INSERT INTO fabric_prices (id, created_at, updated_at, fabric_id, product_category_id, price)
+    SELECT 'bench-fp-' || g, now(), now(), 'bench-f-' || (g % GREATEST(:n / 10, 1) + 1),
+        'bench-c-' || (g % 20 + 1), 50
+    FROM generate_series(1, :n) g
+    """,
+    """
+    INSERT INTO cart (id, created_at, updated_at, customer_id, product_id, quantity)
+    SELECT 'bench-cart-' || g, now(), now(), 'bench-u-' || g, 'bench-p-' || (g % :n + 1), 1
+    FROM generate_series(1, :n) g
+    """,
+]
+
+CLEANUP = [
+    "DELETE FROM cart WHERE id LIKE 'bench-%'",
+    "DELETE FROM fabric_prices WHERE id LIKE 'bench-%'",
+    "DELETE FROM fabrics WHERE id LIKE 'bench-%'",
+    "DELETE FROM products WHERE id LIKE 'bench-%'",
+    "DELETE FROM customers WHERE id LIKE 'bench-%'",
+    "DELETE FROM users WHERE id LIKE 'bench-%'",
+    "DELETE FROM product_categories WHERE id LIKE 'bench-%'",
+]
+
+QUERIES = {
+    "login / current user": (
+        "SELECT * FROM users WHERE lower(email) = lower(:email)",
+        {"email": "bench4242@example.com"},
+    ),
+    "cart by product": ("SELECT * FROM cart WHERE product_id = :id", {"id": "bench-p-42"}),
+    "prices by fabric": (
+        "SELECT * FROM fabric_prices WHERE fabric_id = :id",
+        {"id": "bench-f-42"},
+    ),
+    "prices by category": (
+        "SELECT * FROM fabric_prices WHERE product_category_id = :id",
+        {"id": "bench-c-7"},
+    ),
+    "products by category": (
+        "SELECT * FROM products WHERE category_id = :id",
+        {"id": "bench-c-7"},
+    ),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seed", type=int, help="seed this many rows per table first")
+    parser.add_argument("--cleanup", action="store_true", help="delete seeded rows")
+    args = parser.parse_args()
+
+    engine = create_engine(db_url())
+    with engine.begin() as conn:
+        if args.cleanup:
+            for statement in CLEANUP:
+                conn.execute(text(statement))
+            return
+        if args.seed:
+            for statement in SEED:
+                conn.execute(text(statement), {"n": args.seed})
+            conn.execute(text("ANALYZE"))
+
+    with engine.connect() as conn:
+        for name, (query, params) in QUERIES.items():
+            plan = conn.execute(
+                text(f"EXPLAIN (ANALYZE, BUFFERS) {query}"), params
+            ).scalars()
+            print(f"== {name}")
+            print("\n".join(plan), end="\n\n")
+
+
+if __name__ == "__main__":
+    main()